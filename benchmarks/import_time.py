@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Measures how long it takes to import tzlocal, and to look up the local
+# timezone name in a fresh process. Every measurement is done in a new
+# interpreter, since that is what matters for short-lived processes.
+# The time spent importing tzlocal.windows_tz is reported separately, as
+# reported by "python -X importtime".
+#
+# Run it with "python benchmarks/import_time.py", add --json to get
+# machine-readable output.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SNIPPETS = {
+    "import tzlocal": "import tzlocal",
+    "import tzlocal.windows_tz": "import tzlocal.windows_tz",
+    "get_localzone_name() with TZ set": "import tzlocal; tzlocal.get_localzone_name()",
+    "get_localzone() with TZ set": "import tzlocal; tzlocal.get_localzone()",
+}
+
+TIMER = "import time; _start = time.perf_counter_ns()\n{snippet}\nprint(time.perf_counter_ns() - _start)"
+
+
+def _import_times(stderr):
+    """Parses the output of -X importtime into {module: cumulative microseconds}"""
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            result[module.strip()] = int(cumulative)
+    return result
+
+
+def measure(snippet, runs, env):
+    timings = []
+    windows_tz = []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", TIMER.format(snippet=snippet)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(int(process.stdout) / 1000)
+        windows_tz.append(_import_times(process.stderr).get("tzlocal.windows_tz", 0))
+    return {
+        "min_us": min(timings),
+        "median_us": statistics.median(timings),
+        "windows_tz_import_us": statistics.median(windows_tz),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of tzlocal")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ, TZ="Europe/Warsaw")
+    # Make sure the bytecode is compiled, so that isn't measured
+    subprocess.check_call([sys.executable, "-c", "import tzlocal.windows_tz"], env=env)
+
+    results = {name: measure(snippet, args.runs, env) for name, snippet in SNIPPETS.items()}
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    for name, result in results.items():
+        print(
+            f"{name:35} min {result['min_us']:9.1f} us   median {result['median_us']:9.1f} us   "
+            f"windows_tz {result['windows_tz_import_us']:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# Benchmarks for all the ways tzlocal finds the local timezone.
+#
+# These use pytest-benchmark, and are not run with the normal tests.
+# Run them with:
+#
+#     pytest benchmarks --benchmark-json=benchmark.json
+#
+# and compare two runs with "pytest-benchmark compare".
+
+import datetime
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+import tzlocal
+import tzlocal.stamping
+import tzlocal.unix
+import tzlocal.utils
+import tzlocal.zoneindex
+
+TEST_DATA = Path(__file__).parent.parent / "tests" / "test_data"
+
+ROOTS = [
+    "timezone",
+    "top_line_comment",
+    "zone_setting",
+    "timezone_setting",
+    "vardbzoneinfo",
+    "localtime",
+    "symlink_localtime",
+    "timezone_deprecated",
+    "ubuntu_docker_bug",
+    "noconflict",
+    "conflicting",
+    "termux",
+]
+
+TZ_FORMS = {
+    "name": "Africa/Harare",
+    "colon name": ":Africa/Harare",
+    "path": str(TEST_DATA / "Africa" / "Harare"),
+    "colon path": ":" + str(TEST_DATA / "Africa" / "Harare"),
+    "unnamed path": str(TEST_DATA / "localtime" / "etc" / "localtime"),
+}
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch, mocker):
+    monkeypatch.delenv("TZ", raising=False)
+    # The fixture roots are not the local timezone, so don't warn about it
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    # Termux calls getprop, which we don't have
+    fake_subprocess = MagicMock()
+    fake_subprocess.check_output.return_value = b"Africa/Johannesburg"
+    monkeypatch.setitem(sys.modules, "subprocess", fake_subprocess)
+    _clear_cache()
+    yield
+    _clear_cache()
+
+
+def _clear_cache(module=tzlocal.unix):
+    """Forgets everything tzlocal has cached, so the next lookup is a cold one."""
+    module._cache_tz = None
+    module._cache_tz_name = None
+    # The zones created from files, and the verification of the last one
+    with tzlocal.utils._interned_lock:
+        tzlocal.utils._interned.clear()
+    tzlocal.utils._verified = None
+    # The zoneinfo directory listings and the zone index
+    tzlocal.zoneindex.clear_cache()
+
+
+def _ignoring_errors(function, *args):
+    def call():
+        try:
+            return function(*args)
+        except (LookupError, ValueError):
+            return None
+
+    return call
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("root", ROOTS)
+def test_get_localzone_root(benchmark, root):
+    benchmark.group = "_get_localzone(root)"
+    benchmark(_ignoring_errors(tzlocal.unix._get_localzone, str(TEST_DATA / root)))
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("root", ROOTS)
+def test_get_localzone_name_root(benchmark, root):
+    benchmark.group = "_get_localzone_name(root)"
+    benchmark(_ignoring_errors(tzlocal.unix._get_localzone_name, str(TEST_DATA / root)))
+
+
+@pytest.mark.parametrize("form", TZ_FORMS)
+def test_tz_from_env(benchmark, form):
+    benchmark.group = "_tz_from_env()"
+    benchmark(tzlocal.utils._tz_from_env, TZ_FORMS[form])
+
+
+@pytest.mark.parametrize("form", TZ_FORMS)
+def test_tz_name_from_env(benchmark, form):
+    benchmark.group = "_tz_name_from_env()"
+    benchmark(tzlocal.utils._tz_name_from_env, TZ_FORMS[form])
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_get_localzone_cold(benchmark):
+    benchmark.group = "get_localzone()"
+    benchmark.pedantic(_ignoring_errors(tzlocal.unix.get_localzone), setup=_clear_cache, rounds=200)
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_get_localzone_warm(benchmark):
+    benchmark.group = "get_localzone()"
+    _ignoring_errors(tzlocal.unix.get_localzone)()
+    benchmark(tzlocal.unix.get_localzone)
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_get_localzone_name_cold(benchmark):
+    benchmark.group = "get_localzone_name()"
+    benchmark.pedantic(_ignoring_errors(tzlocal.unix.get_localzone_name), setup=_clear_cache, rounds=200)
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_get_localzone_name_warm(benchmark):
+    benchmark.group = "get_localzone_name()"
+    _ignoring_errors(tzlocal.unix.get_localzone_name)()
+    benchmark(_ignoring_errors(tzlocal.unix.get_localzone_name))
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_reload_localzone(benchmark):
+    benchmark.group = "reload_localzone()"
+    benchmark(_ignoring_errors(tzlocal.unix.reload_localzone))
+
+
+@pytest.mark.parametrize("loader", tzlocal.utils.ZONE_LOADERS)
+def test_zone_from_file(benchmark, monkeypatch, loader):
+    benchmark.group = "zone from file"
+    monkeypatch.setattr(tzlocal.utils, "_zone_loader", loader)
+    # Every round loads the file, as the interned zones are cleared
+    monkeypatch.setattr(tzlocal.utils, "_interned_size", 0)
+    benchmark(tzlocal.utils._tz_from_file, str(TEST_DATA / "localtime" / "etc" / "localtime"), "local")
+
+
+@pytest.mark.parametrize("year", [2030, 2300])
+def test_stamp(benchmark, year):
+    benchmark.group = "stamp()"
+    tz = tzlocal.utils._tz_from_file(str(TEST_DATA / "localtime" / "etc" / "localtime"), "local")
+    start = int(datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+    timestamps = range(start, start + 366 * 86400, 3607)
+    benchmark(lambda: list(tzlocal.stamping.stamp(timestamps, tz, output="tuple")))
+
+
+def test_import(benchmark):
+    benchmark.group = "import"
+    # This is the real subprocess module, imported before the termux fake
+    benchmark.pedantic(
+        subprocess.run, args=([sys.executable, "-c", "import tzlocal"],), kwargs={"check": True}, rounds=20
+    )
+
+
+@pytest.fixture
+def win32(monkeypatch, mocker):
+    if sys.platform != "win32":
+        winreg = MagicMock()
+        winreg.EnumValue.return_value = ("TimeZoneKeyName", "Belarus Standard Time")
+        monkeypatch.setitem(sys.modules, "winreg", winreg)
+    import tzlocal.win32
+
+    mocker.patch("tzlocal.win32.valuestodict", return_value={"TimeZoneKeyName": "Belarus Standard Time"})
+    return tzlocal.win32
+
+
+def test_win32_get_localzone_name(benchmark, win32):
+    benchmark.group = "win32"
+    benchmark(win32._get_localzone_name)
+
+
+def test_win32_get_localzone_cold(benchmark, win32):
+    benchmark.group = "win32"
+
+    benchmark.pedantic(win32.get_localzone, setup=lambda: _clear_cache(win32), rounds=200)
+
+
+def test_win32_get_localzone_warm(benchmark, win32):
+    benchmark.group = "win32"
+    win32.get_localzone()
+    benchmark(win32.get_localzone)
@@ -1,15 +1,39 @@
+import asyncio
+import builtins
+import concurrent.futures
+import json
 import logging
+import mmap
 import os
+import pickle
+import runpy
+import shutil
+import subprocess
 import sys
-from datetime import datetime
+import tarfile
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import MagicMock, Mock
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import pytest
 
+import tzlocal.diskcache
+import tzlocal.mapped
+import tzlocal.posix
+import tzlocal.stamping
+import tzlocal.transitions
+import tzlocal.translate
+import tzlocal.tzif
 import tzlocal.unix
 import tzlocal.utils
+import tzlocal.watch
+import tzlocal.windows_index
+import tzlocal.windows_tz
+import tzlocal.zoneindex
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -51,8 +75,11 @@ def test_env(monkeypatch):
     tz_local = tzlocal.utils._tz_from_env(path)
     assert str(tz_local) == "localtime"
 
-    # Non-zoneinfo timezones are not supported in the TZ environment.
-    pytest.raises(ZoneInfoNotFoundError, tzlocal.utils._tz_from_env, "GMT+03:00")
+    # Other values are POSIX TZ strings, where the offset is the other way around
+    assert tzlocal.utils._tz_from_env("GMT+03:00").utcoffset(None) == timedelta(hours=-3)
+    tz = tzlocal.utils._tz_from_env("EST5EDT,M3.2.0,M11.1.0")
+    assert str(tz) == "EST5EDT,M3.2.0,M11.1.0"
+    assert datetime(2030, 7, 1, tzinfo=tz).utcoffset() == timedelta(hours=-4)
 
     # With a zone that doesn't exist, raises error
     pytest.raises(ZoneInfoNotFoundError, tzlocal.utils._tz_from_env, "Just Nonsense")
@@ -170,6 +197,10 @@ def test_win32(mocker):
     tz = tzlocal.win32.reload_localzone()
     assert str(tz) == "Europe/Minsk"
 
+    # Names without "Standard Time" at the end work too
+    winreg.EnumValue.configure_mock(return_value=("TimeZoneKeyName", "Belarus"))
+    assert tzlocal.win32._get_localzone_name() == "Europe/Minsk"
+
     winreg.EnumValue.configure_mock(return_value=("TimeZoneKeyName", "Not a real timezone"))
     pytest.raises(ZoneInfoNotFoundError, tzlocal.win32._get_localzone_name)
 
@@ -246,10 +277,10 @@ def test_win32_no_dst(mocker):
     assert tz == "Australia/Eucla"
 
 
-def test_termux(mocker):
+def test_termux(mocker, monkeypatch):
     subprocess = MagicMock()
     subprocess.check_output.configure_mock(return_value=b"Africa/Johannesburg")
-    sys.modules["subprocess"] = subprocess
+    monkeypatch.setitem(sys.modules, "subprocess", subprocess)
 
     tz = tzlocal.unix._get_localzone(_root=tz_path("termux"))
     assert str(tz) == "Africa/Johannesburg"
@@ -265,6 +296,17 @@ def test_conflicting():
     assert "Africa/Johannesburg" in message
     
 
+def test_conflicting_aliases(tmp_path):
+    # Old names are the same timezone as the new ones, even without a zoneinfo tree to look in
+    (tmp_path / "etc" / "sysconfig").mkdir(parents=True)
+    (tmp_path / "etc" / "timezone").write_text("Europe/Kiev\n")
+    (tmp_path / "etc" / "sysconfig" / "clock").write_text('ZONE="Europe/Kyiv"\n')
+    assert tzlocal.unix._get_localzone_name(_root=str(tmp_path)) in ("Europe/Kiev", "Europe/Kyiv")
+
+    unique = tzlocal.unix._get_unique_tzs({"a": "US/Eastern", "b": "America/New_York", "c": "Etc/UTC"}, str(tmp_path))
+    assert unique == {"America/New_York", "Etc/UTC"}
+
+
 def test_zoneinfo_compatibility():
     os.environ["TZ"] = "Africa/Harare"
     tzlocal.unix.reload_localzone()
@@ -304,3 +346,1338 @@ def test_broken():
         with pytest.warns(UserWarning, match="Syntax error in"):
             tz = tzlocal.unix._get_localzone(_root=tz_path("broken"))
     assert "UTC" in tz.key
+
+
+def _wait_for(event, timeout=5):
+    assert event.wait(timeout), "Timed out waiting for the watcher"
+    event.clear()
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch(tmp_path, use_inotify):
+    if use_inotify and tzlocal.watch._load_inotify() is None:
+        pytest.skip("No inotify on this platform")
+
+    etc = tmp_path / "etc"
+    etc.mkdir()
+    changed = threading.Event()
+    watcher = tzlocal.watch.watch(
+        [etc / "timezone", etc / "localtime"], changed.set, poll_interval=0.01, use_inotify=use_inotify
+    )
+    try:
+        assert isinstance(watcher, tzlocal.watch.InotifyWatcher if use_inotify else tzlocal.watch.PollingWatcher)
+        # Creating a file is noticed
+        (etc / "timezone").write_text("Africa/Harare\n")
+        _wait_for(changed)
+        # And so is repointing a symlink
+        (etc / "localtime").symlink_to("/usr/share/zoneinfo/Africa/Harare")
+        _wait_for(changed)
+        (etc / "localtime").unlink()
+        (etc / "localtime").symlink_to("/usr/share/zoneinfo/Europe/Warsaw")
+        _wait_for(changed)
+        # Unrelated files are not
+        (etc / "hostname").write_text("example\n")
+        assert not changed.wait(0.2)
+    finally:
+        watcher.stop()
+    assert not watcher.running
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch_missing_directory(tmp_path, use_inotify):
+    if use_inotify and tzlocal.watch._load_inotify() is None:
+        pytest.skip("No inotify on this platform")
+
+    sysconfig = tmp_path / "etc" / "sysconfig"
+    changed = threading.Event()
+    watcher = tzlocal.watch.watch([sysconfig / "clock"], changed.set, poll_interval=0.01, use_inotify=use_inotify)
+    try:
+        # The directories are created after the watching started
+        sysconfig.mkdir(parents=True)
+        (sysconfig / "clock").write_text('ZONE="Africa/Harare"\n')
+        _wait_for(changed)
+        (sysconfig / "clock").write_text('ZONE="Europe/Warsaw"\n')
+        _wait_for(changed)
+        # And removed and created again
+        shutil.rmtree(sysconfig)
+        _wait_for(changed)
+        sysconfig.mkdir()
+        (sysconfig / "clock").write_text('ZONE="Africa/Harare"\n')
+        _wait_for(changed)
+        (sysconfig / "clock").write_text('ZONE="Europe/Warsaw"\n')
+        _wait_for(changed)
+    finally:
+        watcher.stop()
+
+
+def test_watch_inotify_fallbacks(tmp_path):
+    libc = tzlocal.watch._load_inotify()
+    if libc is None:
+        pytest.skip("No inotify on this platform")
+
+    # Lost events are changes, and everything is watched again
+    changed = threading.Event()
+    watcher = tzlocal.watch.InotifyWatcher([tmp_path / "timezone"], changed.set)
+    try:
+        overflow = tzlocal.watch._event_header.pack(-1, tzlocal.watch.IN_Q_OVERFLOW, 0, 0)
+        assert watcher._read_events(overflow) == (True, True)
+        (wd,) = watcher._names
+        ignored = tzlocal.watch._event_header.pack(wd, tzlocal.watch.IN_IGNORED, 0, 0)
+        assert watcher._read_events(ignored) == (True, True)
+    finally:
+        watcher._close()
+
+    # Files that can't be watched are polled
+    class NoWatches:
+        inotify_init1 = libc.inotify_init1
+
+        @staticmethod
+        def inotify_add_watch(fd, path, mask):
+            return -1
+
+    watcher = tzlocal.watch.InotifyWatcher([tmp_path / "timezone"], changed.set, libc=NoWatches, poll_interval=0.01)
+    watcher.start()
+    try:
+        assert watcher._names == {}
+        (tmp_path / "timezone").write_text("Africa/Harare\n")
+        _wait_for(changed)
+    finally:
+        watcher.stop()
+
+
+def test_watch_localzone(tmp_path, monkeypatch):
+    shutil.copytree(tz_path("timezone"), tmp_path, dirs_exist_ok=True)
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", "Africa/Harare")
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz", ZoneInfo("Africa/Harare"))
+
+    tzlocal.unix.watch_localzone(poll_interval=0.01, _root=str(tmp_path))
+    try:
+        # Calling it again doesn't start another watcher
+        assert tzlocal.unix.watch_localzone(_root=str(tmp_path)) is tzlocal.unix._watcher
+        (tmp_path / "etc" / "timezone").write_text("Europe/Warsaw\n")
+        deadline = time.monotonic() + 5
+        while tzlocal.unix._cache_tz is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert tzlocal.unix._cache_tz is None
+        assert tzlocal.unix._cache_tz_name is None
+    finally:
+        tzlocal.unix.unwatch_localzone()
+    assert tzlocal.unix._watcher is None
+
+
+def test_revalidation(mocker, monkeypatch):
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    probe = mocker.spy(tzlocal.unix, "_get_localzone")
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz", None)
+    monkeypatch.setenv("TZ", "Africa/Harare")
+
+    tzlocal.unix.set_revalidation_interval(0)
+    try:
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Harare"
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Harare"
+        # Nothing changed, so it was only looked up once
+        assert probe.call_count == 1
+
+        # Changing the TZ changes the fingerprint, so no reload is needed
+        monkeypatch.setenv("TZ", "Africa/Johannesburg")
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Johannesburg"
+        assert tzlocal.unix.get_localzone_name() == "Africa/Johannesburg"
+        assert probe.call_count == 2
+
+        # With a long interval, the change isn't noticed until the interval passed
+        tzlocal.unix.set_revalidation_interval(3600)
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Johannesburg"
+        monkeypatch.setenv("TZ", "Africa/Harare")
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Johannesburg"
+        monkeypatch.setattr(tzlocal.unix, "_revalidated_at", tzlocal.unix._revalidated_at - 3600)
+        assert str(tzlocal.unix.get_localzone()) == "Africa/Harare"
+    finally:
+        tzlocal.unix.set_revalidation_interval(None)
+
+    # Without revalidation, the cache is trusted
+    monkeypatch.setenv("TZ", "Africa/Johannesburg")
+    assert str(tzlocal.unix.get_localzone()) == "Africa/Harare"
+
+    # Another thread can turn revalidation off after get_localzone() checked that it's on
+    monkeypatch.setattr(tzlocal.unix, "_revalidated_at", 0.0)
+    tzlocal.unix._revalidate()
+    assert str(tzlocal.unix.get_localzone()) == "Africa/Harare"
+
+
+def test_fingerprint(tmp_path):
+    fingerprint = tzlocal.unix._fingerprint(str(tmp_path))
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "localtime").symlink_to("/usr/share/zoneinfo/Africa/Harare")
+    assert tzlocal.unix._fingerprint(str(tmp_path)) != fingerprint
+    fingerprint = tzlocal.unix._fingerprint(str(tmp_path))
+    assert tzlocal.unix._fingerprint(str(tmp_path)) == fingerprint
+
+    (tmp_path / "etc" / "localtime").unlink()
+    (tmp_path / "etc" / "localtime").symlink_to("/usr/share/zoneinfo/Africa/Johannesburg")
+    assert tzlocal.unix._fingerprint(str(tmp_path)) != fingerprint
+
+
+def test_windows_tz_not_imported():
+    # The Windows mappings are big, so they should only be loaded when needed
+    code = (
+        "import sys, tzlocal\n"
+        "assert 'tzlocal.zoneindex' not in sys.modules\n"
+        "assert tzlocal.get_localzone_name() == 'Africa/Harare'\n"
+        "assert 'tzlocal.windows_tz' not in sys.modules\n"
+        "assert 'tzlocal.aio' not in sys.modules\n"
+    )
+    env = dict(os.environ, TZ="Africa/Harare")
+    subprocess.check_call([sys.executable, "-c", code], env=env)
+
+
+def test_is_zone_key():
+    assert tzlocal.zoneindex.is_zone_key("Africa/Harare")
+    assert tzlocal.zoneindex.is_zone_key("UTC")
+    assert not tzlocal.zoneindex.is_zone_key("localtime")
+    assert not tzlocal.zoneindex.is_zone_key("Just Nonsense")
+    assert not tzlocal.zoneindex.is_zone_key("../Africa/Harare")
+    assert not tzlocal.zoneindex.is_zone_key("/usr/share/zoneinfo/Africa/Harare")
+
+
+def test_windows_index():
+    index = tzlocal.windows_index.get_index()
+    # The index must have exactly the same data as the dictionaries
+    assert sorted(index.zone_names()) == sorted(tzlocal.windows_tz.tz_win)
+    assert sorted(index.windows_names()) == sorted(tzlocal.windows_tz.win_tz)
+    for zone, win in tzlocal.windows_tz.tz_win.items():
+        assert index.tz_to_win(zone) == win
+    for win, zone in tzlocal.windows_tz.win_tz.items():
+        assert index.win_to_tz(win) == zone
+
+    assert "Europe/Minsk" in index
+    assert "Belarus Standard Time" not in index
+    assert index.is_windows_name("Belarus Standard Time")
+    assert index.tz_to_win("Not/A_Zone") is None
+
+    # Case-insensitive lookups
+    assert index.tz_to_win("europe/minsk") is None
+    assert index.tz_to_win("europe/minsk", ignore_case=True) == "Belarus Standard Time"
+    assert index.win_to_tz("BELARUS STANDARD TIME", ignore_case=True) == "Europe/Minsk"
+    assert index.find("us/pacific", ignore_case=True) == "US/Pacific"
+
+    # Prefix lookups
+    us = index.startswith("US/")
+    assert "US/Pacific" in us
+    assert all(name.startswith("US/") for name in us)
+    assert us == sorted(us)
+    assert index.startswith("us/", ignore_case=True) == us
+    assert index.startswith("Nonsense") == []
+
+
+def test_translate():
+    # Case, suffixes and NUL bytes from the registry don't matter
+    assert tzlocal.translate.win_to_tz(
+        ["Belarus Standard Time", "belarus", "Pacific Daylight Time", "Belarus Standard Time\x00\x00", "Nonsense", None]
+    ) == ["Europe/Minsk", "Europe/Minsk", "America/Los_Angeles", "Europe/Minsk", None, None]
+    assert tzlocal.translate.win_to_tz_name("India Standard Time") == "Asia/Calcutta"
+    assert tzlocal.translate.win_to_tz_name("India Standard Time", canonical=True) == "Asia/Kolkata"
+
+    # Old names are translated like the current ones, and the other way around
+    assert tzlocal.translate.tz_to_win(iter(["europe/minsk", "US/East-Indiana", "GMT", "", "Not/A_Zone"])) == [
+        "Belarus Standard Time",
+        "US Eastern Standard Time",
+        "UTC",
+        None,
+        None,
+    ]
+
+    # Misses are remembered too
+    tzlocal.translate.tz_to_win_name.cache_clear()
+    tzlocal.translate.tz_to_win(["Not/A_Zone"] * 3)
+    assert tzlocal.translate.tz_to_win_name.cache_info().misses == 1
+
+    with pytest.raises(TypeError):
+        tzlocal.translate.tz_to_win("Europe/Minsk")
+
+
+def test_translate_arrays():
+    np = pytest.importorskip("numpy")
+
+    # Arrays give arrays of the same shape
+    names = np.array([["Europe/Minsk", "Nonsense"], ["Europe/Minsk", "Asia/Kolkata"]])
+    translated = tzlocal.translate.tz_to_win(names)
+    assert translated.shape == (2, 2)
+    assert translated.tolist() == [["Belarus Standard Time", None], ["Belarus Standard Time", "India Standard Time"]]
+    translated = tzlocal.translate.win_to_tz(np.array(["Belarus Standard Time", None], dtype=object))
+    assert translated.tolist() == ["Europe/Minsk", None]
+
+
+def test_windows_index_build():
+    win_tz = {"Belarus Standard Time": "Europe/Minsk", "UTC": "Etc/UTC"}
+    tz_win = {"Europe/Minsk": "Belarus Standard Time", "Etc/UTC": "UTC", "UTC": "UTC"}
+    index = tzlocal.windows_index.WindowsZoneIndex(tzlocal.windows_index.build_index(win_tz, tz_win))
+    # Names are only stored once, even if they are used both as zone name and Windows name
+    assert len(index) == 4
+    assert index.win_to_tz("UTC") == "Etc/UTC"
+    assert index.tz_to_win("UTC") == "UTC"
+    assert index.startswith("E") == ["Etc/UTC", "Europe/Minsk"]
+
+    pytest.raises(ValueError, tzlocal.windows_index.WindowsZoneIndex, b"Nonsense" * 4)
+
+
+def test_update_windows_mappings(tmp_path):
+    fixtures = Path(tz_path("windows_mappings"))
+    with tarfile.open(tmp_path / "tzdata.tar.gz", "w:gz") as archive:
+        archive.add(fixtures / "windowsZones.xml", "africa")
+        archive.add(fixtures / "backward", "backward")
+    output = tmp_path / "tzlocal"
+    output.mkdir()
+    script = Path(__file__).parent.parent / "update_windows_mappings.py"
+
+    def update(tzdata, windows_zones):
+        arguments = ["--tzdata", str(tzdata), "--windows-zones", str(windows_zones), "--output-dir", str(output)]
+        return subprocess.check_output([sys.executable, str(script), *arguments], cwd=script.parent, text=True)
+
+    # It runs from local files, and reports the added mappings
+    report = update(tmp_path / "tzdata.tar.gz", fixtures / "windowsZones.xml")
+    assert "+ win_tz['Pacific Standard Time'] = 'America/Los_Angeles'" in report
+    mappings = runpy.run_path(str(output / "windows_tz.py"))
+    assert mappings["win_tz"]["India Standard Time"] == "Asia/Calcutta"
+    # The names in backward are mapped too
+    assert mappings["tz_win"]["Asia/Kolkata"] == "India Standard Time"
+    assert mappings["tz_win"]["Europe/Kyiv"] == "FLE Standard Time"
+    assert mappings["tz_win"]["US/Pacific"] == "Pacific Standard Time"
+    assert runpy.run_path(str(output / "tz_aliases.py"))["aliases"]["Universal"] == "Etc/UTC"
+    index = tzlocal.windows_index.load_index(str(output / "windows_tz.idx"))
+    assert index.win_to_tz("UTC") == "Etc/UTC"
+
+    # Nothing is generated if the inputs are the same
+    modified = (output / "windows_tz.py").stat().st_mtime_ns
+    assert "nothing was generated" in update(tmp_path / "tzdata.tar.gz", fixtures / "windowsZones.xml")
+    assert (output / "windows_tz.py").stat().st_mtime_ns == modified
+
+    # The backward file can be used instead of the tarball, and removed mappings are reported
+    zones = (fixtures / "windowsZones.xml").read_text().replace("America/Vancouver", "America/Edmonton")
+    (tmp_path / "windowsZones.xml").write_text(zones)
+    report = update(fixtures / "backward", tmp_path / "windowsZones.xml")
+    assert report.splitlines() == [
+        "2 mappings changed:",
+        "+ tz_win['America/Edmonton'] = 'Pacific Standard Time'",
+        "- tz_win['America/Vancouver'] = 'Pacific Standard Time'",
+    ]
+
+
+def _hammer(function, threads=32):
+    """Calls function from many threads at once, and returns the results."""
+
+    barrier = threading.Barrier(threads)
+
+    def call():
+        barrier.wait()
+        return function()
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        futures = [executor.submit(call) for _ in range(threads)]
+        return [future.result() for future in futures]
+
+
+def test_single_flight(mocker, monkeypatch):
+    probes = []
+
+    def slow_probe(_root="/"):
+        probes.append(1)
+        time.sleep(0.05)
+        return ZoneInfo("Africa/Harare")
+
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz", None)
+    monkeypatch.setattr(tzlocal.unix, "_get_localzone", slow_probe)
+    results = _hammer(tzlocal.unix.get_localzone)
+    # Only one thread looked up the zone, the others waited for it
+    assert len(probes) == 1
+    assert all(tz is results[0] for tz in results)
+
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", None)
+    monkeypatch.setattr(tzlocal.unix, "_get_localzone_name", lambda *args: probes.append(1) or "Africa/Harare")
+    assert set(_hammer(tzlocal.unix.get_localzone_name)) == {"Africa/Harare"}
+    assert len(probes) == 2
+
+
+def test_reload_is_atomic(mocker, monkeypatch):
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setenv("TZ", "Africa/Harare")
+    tzlocal.unix.reload_localzone()
+
+    def reload_or_read():
+        tzlocal.unix.reload_localzone()
+        with tzlocal.unix._cache_lock:
+            return tzlocal.unix._cache_tz_name, str(tzlocal.unix._cache_tz)
+
+    # While holding the lock, the name and the zone always match
+    assert set(_hammer(reload_or_read)) == {("Africa/Harare", "Africa/Harare")}
+
+    # A failing reload leaves the cache alone
+    monkeypatch.setattr(tzlocal.unix, "_get_localzone", Mock(side_effect=ZoneInfoNotFoundError("Nope")))
+    pytest.raises(ZoneInfoNotFoundError, tzlocal.unix.reload_localzone)
+    assert tzlocal.unix._cache_tz_name == "Africa/Harare"
+    assert str(tzlocal.unix._cache_tz) == "Africa/Harare"
+
+
+def test_win32_single_flight(mocker, monkeypatch):
+    sys.modules["winreg"] = MagicMock()
+    import tzlocal.win32
+
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    probes = []
+
+    def slow_probe():
+        probes.append(1)
+        time.sleep(0.05)
+        return "Europe/Minsk"
+
+    monkeypatch.setattr(tzlocal.win32, "_cache_tz", None)
+    monkeypatch.setattr(tzlocal.win32, "_cache_tz_name", None)
+    monkeypatch.setattr(tzlocal.win32, "_get_localzone_name", slow_probe)
+    assert {str(tz) for tz in _hammer(tzlocal.win32.get_localzone)} == {"Europe/Minsk"}
+    assert len(probes) == 1
+
+
+def _in_child(function):
+    """Runs function in a forked child process, and returns what it returns."""
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read)
+            os.write(write, json.dumps(function()).encode())
+            status = 0
+        finally:
+            # Never return to the test runner in the child
+            os._exit(status)
+
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        result = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0, "The function failed in the child process"
+    return json.loads(result)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_fork_policy(mocker, monkeypatch):
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setenv("TZ", "Africa/Harare")
+    # A name that can't have been looked up, so we can see if the cache is used
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", "Cached/Zone")
+
+    def child():
+        return tzlocal.unix.get_localzone_name()
+
+    def child_with_new_tz():
+        os.environ["TZ"] = "Africa/Johannesburg"
+        return tzlocal.unix.get_localzone_name()
+
+    try:
+        tzlocal.unix.set_fork_policy("inherit")
+        assert _in_child(child) == "Cached/Zone"
+        assert _in_child(child_with_new_tz) == "Cached/Zone"
+
+        tzlocal.unix.set_fork_policy("reset")
+        assert _in_child(child) == "Africa/Harare"
+
+        tzlocal.unix.set_fork_policy("revalidate")
+        # Nothing changed, so the cache is used
+        assert _in_child(child) == "Cached/Zone"
+        # But the child notices if the configuration changed after the fork
+        assert _in_child(child_with_new_tz) == "Africa/Johannesburg"
+
+        def child_after_revalidation():
+            tzlocal.unix.get_localzone_name()
+            return tzlocal.unix._revalidate_interval
+
+        # The revalidation is done once, not on every call
+        assert _in_child(child_after_revalidation) is None
+
+        pytest.raises(ValueError, tzlocal.unix.set_fork_policy, "nonsense")
+
+        # Warming fills the cache in the parent before forking
+        monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", None)
+        monkeypatch.setattr(tzlocal.unix, "_cache_tz", None)
+        tzlocal.unix.set_fork_policy("inherit", warm=True)
+        assert _in_child(lambda: str(tzlocal.unix._cache_tz)) == "Africa/Harare"
+        assert tzlocal.unix._cache_tz_name == "Africa/Harare"
+    finally:
+        tzlocal.unix.set_fork_policy()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_fork_resets_locks():
+    cache = tzlocal.transitions.year_cache(ZoneInfo("Africa/Harare"))
+    locks = [
+        lambda: tzlocal.unix._cache_lock,
+        lambda: tzlocal.utils._interned_lock,
+        lambda: tzlocal.zoneindex._index_lock,
+        lambda: tzlocal.zoneindex._listings_lock,
+        lambda: tzlocal.transitions._histories_lock,
+        lambda: tzlocal.transitions._year_caches_lock,
+        lambda: cache._lock,
+    ]
+    held = [lock() for lock in locks]
+    for lock in held:
+        lock.acquire()
+    try:
+        # The threads that held the locks don't exist in the child, so the locks must be free there
+        assert _in_child(lambda: [lock().acquire(blocking=False) for lock in locks]) == [True] * len(locks)
+    finally:
+        for lock in held:
+            lock.release()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_fork_restarts_watcher(tmp_path):
+    watcher = tzlocal.unix.watch_localzone(poll_interval=0.01, _root=str(tmp_path))
+    try:
+        # The child gets a watcher of its own
+        assert _in_child(lambda: tzlocal.unix._watcher.running and tzlocal.unix._watcher is not watcher)
+        assert watcher.running
+    finally:
+        tzlocal.unix.unwatch_localzone()
+
+
+def test_async(mocker, monkeypatch):
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setenv("TZ", "Africa/Harare")
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz", None)
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", None)
+    probe = tzlocal.unix._get_localzone
+    probes = []
+
+    def slow_probe(_root="/"):
+        probes.append(1)
+        time.sleep(0.1)
+        return probe(_root)
+
+    monkeypatch.setattr(tzlocal.unix, "_get_localzone", slow_probe)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        zones = await asyncio.gather(*(tzlocal.get_localzone_async() for _ in range(20)))
+        ticking.cancel()
+        return zones, ticks
+
+    zones, ticks = asyncio.run(main())
+    assert {str(tz) for tz in zones} == {"Africa/Harare"}
+    # All the callers shared one lookup
+    assert len(probes) == 1
+    # And the event loop kept running while it happened
+    assert ticks > 2
+    # The cache is shared with the blocking API
+    assert tzlocal.unix.get_localzone() is zones[0]
+    assert asyncio.run(tzlocal.get_localzone_async()) is zones[0]
+    assert len(probes) == 1
+
+    assert asyncio.run(tzlocal.get_localzone_name_async()) == "Africa/Harare"
+    monkeypatch.setenv("TZ", "Africa/Johannesburg")
+    assert str(asyncio.run(tzlocal.reload_localzone_async())) == "Africa/Johannesburg"
+    assert str(tzlocal.unix.get_localzone()) == "Africa/Johannesburg"
+    assert tzlocal.aio._inflight == {}
+
+    pytest.raises(AttributeError, getattr, tzlocal, "nonsense")
+
+
+def test_async_revalidation(mocker, monkeypatch):
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setenv("TZ", "Africa/Harare")
+    fingerprint = tzlocal.unix._fingerprint
+    threads = []
+
+    def checking_fingerprint(*args):
+        threads.append(threading.current_thread())
+        return fingerprint(*args)
+
+    monkeypatch.setattr(tzlocal.unix, "_fingerprint", checking_fingerprint)
+    try:
+        tzlocal.unix.set_revalidation_interval(3600)
+        tzlocal.unix.get_localzone()
+        assert not tzlocal.unix._revalidation_due()
+        # When nothing is due, the cached zone is returned on the event loop
+        assert str(asyncio.run(tzlocal.get_localzone_async())) == "Africa/Harare"
+        assert threads == [threading.main_thread()]
+
+        # But checking the configuration is done in the executor
+        tzlocal.unix.set_revalidation_interval(0)
+        assert tzlocal.unix._revalidation_due()
+        assert str(asyncio.run(tzlocal.get_localzone_async())) == "Africa/Harare"
+        assert asyncio.run(tzlocal.get_localzone_name_async()) == "Africa/Harare"
+        assert len(threads) == 3
+        assert threading.main_thread() not in threads[1:]
+    finally:
+        tzlocal.unix.set_revalidation_interval(None)
+
+
+def test_resolve_roots(monkeypatch):
+    # The TZ environment is not used for other roots
+    monkeypatch.setenv("TZ", "Europe/Warsaw")
+    names = ["timezone", "zone_setting", "localtime", "conflicting", "timezone_deprecated", "termux", "broken"]
+    roots = [tz_path(name) for name in names]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = list(tzlocal.unix.resolve_roots(iter(roots * 10), max_workers=4))
+
+    assert [result.root for result in results] == roots * 10
+    results = dict(zip(names, results))
+
+    timezone = results["timezone"]
+    assert timezone.name == "Africa/Harare"
+    assert str(timezone.tz) == "Africa/Harare"
+    assert timezone.source == os.path.join(tz_path("timezone"), "etc/timezone")
+    assert timezone.error is None
+    assert timezone.conflicts == []
+
+    assert results["zone_setting"].source == os.path.join(tz_path("zone_setting"), "etc/sysconfig/clock")
+
+    localtime = results["localtime"]
+    assert localtime.name is None
+    assert str(localtime.tz) == "local"
+    assert localtime.source == os.path.join(tz_path("localtime"), "etc/localtime")
+
+    conflicting = results["conflicting"]
+    assert conflicting.tz is None
+    assert isinstance(conflicting.error, ZoneInfoNotFoundError)
+    assert conflicting.conflicts == list(conflicting.configs)
+    assert len(conflicting.conflicts) == 5
+
+    # The /etc/timezone file is ignored when it conflicts
+    deprecated = results["timezone_deprecated"]
+    assert deprecated.name == "Africa/Johannesburg"
+    assert deprecated.conflicts == [os.path.join(tz_path("timezone_deprecated"), "etc/timezone")]
+
+    # No getprop is run for termux roots, and with no configuration we get UTC
+    for name in ("termux", "broken"):
+        assert results[name].source is None
+        assert "UTC" in str(results[name].tz)
+
+
+def test_tz_from_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tzlocal.utils, "_interned", type(tzlocal.utils._interned)())
+    harare = tz_path(os.path.join("Africa", "Harare"))
+    copy = tmp_path / "Harare"
+    shutil.copy(harare, copy)
+
+    # The same contents give the same object, even from different files
+    tz = tzlocal.utils._tz_from_file(harare, key="local")
+    assert tzlocal.utils._tz_from_file(harare, key="local") is tz
+    assert tzlocal.utils._tz_from_file(str(copy), key="local") is tz
+    # But not with a different key
+    assert tzlocal.utils._tz_from_file(harare, key="Africa/Harare") is not tz
+
+    # The localtime fallback and the TZ environment use it too
+    shutil.copy(tz_path(os.path.join("localtime", "etc", "localtime")), copy)
+    _, localtime = tzlocal.unix._read_localtime(tz_path("localtime"))
+    assert tzlocal.unix._read_localtime(tz_path("localtime"))[1] is localtime
+    assert tzlocal.utils._tz_from_file(str(copy), key="local") is localtime
+    assert tzlocal.utils._tz_from_env(harare) is tzlocal.utils._tz_from_env(":" + harare)
+
+    # The number of interned timezones is limited
+    monkeypatch.setattr(tzlocal.utils, "_interned_size", 2)
+    for key in ("a", "b", "c"):
+        tzlocal.utils._tz_from_file(harare, key=key)
+    assert [key for _, key in tzlocal.utils._interned] == ["b", "c"]
+
+
+def test_trace(mocker, monkeypatch):
+    trace = tzlocal.unix.trace_localzone(_root=tz_path("timezone"))
+    assert str(trace.tz) == "Africa/Harare"
+    assert trace.name == "Africa/Harare"
+    assert trace.error is None
+    steps = [step.step for step in trace.steps]
+    assert steps == [
+        "env",
+        "termux getprop",
+        "etc/timezone",
+        "var/db/zoneinfo",
+        "etc/sysconfig/clock",
+        "etc/conf.d/clock",
+        "localtime symlink",
+    ]
+    hits = [step for step in trace.steps if step.hit]
+    assert [(step.step, step.detail) for step in hits] == [("etc/timezone", "Africa/Harare")]
+    assert all(step.duration_ns >= 0 for step in trace.steps)
+    assert trace.total_ns == sum(step.duration_ns for step in trace.steps)
+
+    exported = trace.as_dict()
+    assert exported["tz"] == "Africa/Harare"
+    assert exported["steps"][2] == {
+        "step": "etc/timezone",
+        "hit": True,
+        "duration_ns": trace.steps[2].duration_ns,
+        "detail": "Africa/Harare",
+        # Listing etc/ and reading etc/timezone
+        "syscalls": 2,
+    }
+
+    # Conflicts are recorded, and the dedup step is traced
+    trace = tzlocal.unix.trace_localzone(_root=tz_path("conflicting"))
+    assert isinstance(trace.error, ZoneInfoNotFoundError)
+    assert trace.tz is None
+    assert [step.step for step in trace.steps].count("alias dedup") == 2
+
+    trace = tzlocal.unix.trace_localzone(_root=tz_path("localtime"))
+    assert trace.name is None
+    assert trace.steps[-1].step == "localtime file"
+    assert trace.steps[-1].hit
+
+    # With TZ set, nothing else is looked at
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setenv("TZ", "Africa/Harare")
+    trace = tzlocal.unix.trace_localzone()
+    assert [(step.step, step.hit) for step in trace.steps] == [("env", True)]
+    assert trace.name == "Africa/Harare"
+    # Without it, on the real root, the offset is verified
+    monkeypatch.delenv("TZ")
+    trace = tzlocal.unix.trace_localzone()
+    assert trace.error is not None or trace.steps[-1].step == "offset assertion"
+
+
+def test_tzif():
+    data = tzlocal.tzif.zone_data(ZoneInfo("Europe/Amsterdam"))
+    assert data.footer == "CET-1CEST,M3.5.0,M10.5.0/3"
+    assert data.abbreviations[data.type_before()] == "LMT"
+    tz = ZoneInfo("Europe/Amsterdam")
+    for transition, index in zip(data.transitions, data.indices):
+        when = datetime.fromtimestamp(transition, tz)
+        assert when.utcoffset().total_seconds() == data.utcoffsets[index]
+
+    # Timezones from files are read from the data they were created from
+    tz = tzlocal.utils._tz_from_file(tz_path("Africa/Harare"), key="local")
+    data = tzlocal.tzif.zone_data(tz)
+    assert data.abbreviations == ("LMT", "CAT")
+    assert data.footer == "CAT-2"
+
+    assert tzlocal.tzif.zone_data(timezone.utc) is None
+    with pytest.raises(ValueError):
+        tzlocal.tzif.parse(b"Not a TZif file" * 4)
+
+
+@pytest.mark.parametrize(
+    "key", ["Europe/Amsterdam", "America/New_York", "Australia/Lord_Howe", "Africa/Casablanca", "Etc/GMT-14", "UTC"]
+)
+def test_mapped_zone(key, tmp_path):
+    path = tmp_path / "zone"
+    path.write_bytes(tzlocal.tzif._read_zone_file(key))
+    expected = ZoneInfo.from_file(path.open("rb"), key=key)
+    tz = tzlocal.mapped.load(str(path), key=key)
+    assert str(tz) == key
+    assert (tz.utcoffset(None), tz.dst(None), tz.tzname(None)) == (
+        expected.utcoffset(None),
+        expected.dst(None),
+        expected.tzname(None),
+    )
+
+    # Around each transition, and far before and after them
+    data = tzlocal.tzif.parse(path.read_bytes())
+    times = [when + delta for when in data.transitions for delta in (-3601, -1, 0, 1, 1800, 3600)]
+    times += range(-(2**35), 2**36, 2**31 - 1)
+    for timestamp in times:
+        utc = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=timestamp)
+        local, expected_local = utc.astimezone(tz), utc.astimezone(expected)
+        assert local.replace(tzinfo=None) == expected_local.replace(tzinfo=None)
+        assert local.fold == expected_local.fold
+        for fold in (0, 1):
+            wall, expected_wall = local.replace(fold=fold), expected_local.replace(fold=fold)
+            assert wall.utcoffset() == expected_wall.utcoffset()
+            assert wall.dst() == expected_wall.dst()
+            assert wall.tzname() == expected_wall.tzname()
+
+    assert pickle.loads(pickle.dumps(tz)).key == key
+    assert tzlocal.tzif.zone_data(tz) == data
+
+
+@pytest.mark.parametrize(
+    "tzstring, key",
+    [
+        ("CET-1CEST,M3.5.0,M10.5.0/3", "Europe/Amsterdam"),
+        ("AEST-10AEDT,M10.1.0,M4.1.0/3", "Australia/Sydney"),
+        ("<+1030>-10:30<+11>-11,M10.1.0,M4.1.0", "Australia/Lord_Howe"),
+        ("IST-1GMT0,M10.5.0,M3.5.0/1", "Europe/Dublin"),
+        ("PST8PDT", "America/Los_Angeles"),
+        ("<-03>3", "America/Sao_Paulo"),
+    ],
+)
+def test_posix_zone(tzstring, key):
+    tz = tzlocal.posix.parse(tzstring)
+    assert str(tz) == tzstring
+    expected = ZoneInfo(key)
+    for timestamp in range(2051222400, 2114380800, 3 * 3600 - 1):
+        utc = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=timestamp)
+        local, expected_local = utc.astimezone(tz), utc.astimezone(expected)
+        assert local.replace(tzinfo=None) == expected_local.replace(tzinfo=None)
+        assert local.fold == expected_local.fold
+        for fold in (0, 1):
+            wall, expected_wall = local.replace(fold=fold), expected_local.replace(fold=fold)
+            assert wall.utcoffset() == expected_wall.utcoffset()
+            assert wall.dst() == expected_wall.dst()
+            assert wall.tzname() == expected_wall.tzname()
+
+    assert pickle.loads(pickle.dumps(tz)) is tz
+    table = tzlocal.transitions.transition_table(tz, 2040, 2045)
+    expected_table = tzlocal.transitions.transition_table(expected, 2040, 2045)
+    assert list(table) == list(expected_table)
+
+
+def test_posix_zone_years():
+    # The DST periods are only kept for the most recently used years
+    tz = tzlocal.posix.PosixZone("EST5EDT,M3.2.0,M11.1.0")
+    for year in range(1900, 2100):
+        datetime(year, 7, 1, tzinfo=tz).utcoffset()
+    assert list(tz._years) == list(range(2100 - tzlocal.posix.YEAR_CACHE_SIZE, 2100))
+    datetime(2068, 7, 1, tzinfo=tz).utcoffset()
+    assert next(reversed(tz._years)) == 2068
+    assert datetime(1950, 7, 1, tzinfo=tz).utcoffset() == timedelta(hours=-4)
+
+
+@pytest.mark.parametrize("tzstring", ["Just Nonsense", "Foo", "Foo-25", "Foo-1Bar,M13.1.0,M10.5.0", "Foo5Bar,J0,J365"])
+def test_posix_zone_errors(tzstring):
+    with pytest.raises(ValueError):
+        tzlocal.posix.parse(tzstring)
+    with pytest.raises(ZoneInfoNotFoundError):
+        tzlocal.utils._tz_from_env(tzstring)
+
+
+@pytest.mark.parametrize("tzstring", ["EST5EDT,M3.2.0,M11.1.0", "XYZ-3"])
+def test_posix_zone_name(mocker, monkeypatch, tzstring):
+    # The name and the zone both come from the POSIX TZ string, not from the configuration files
+    mocker.patch("tzlocal.utils.assert_tz_offset")
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz", None)
+    monkeypatch.setattr(tzlocal.unix, "_cache_tz_name", None)
+    monkeypatch.setenv("TZ", tzstring)
+
+    assert tzlocal.unix.get_localzone_name() == tzstring
+    assert str(tzlocal.unix.get_localzone()) == tzstring
+    assert tzlocal.utils._tz_from_name(tzstring) is tzlocal.unix.get_localzone()
+    pytest.raises(ZoneInfoNotFoundError, tzlocal.utils._tz_from_name, "Just Nonsense")
+
+
+def test_zone_loader(monkeypatch, tmp_path):
+    try:
+        tzlocal.utils.set_zone_loader("mmap")
+        tz = tzlocal.unix._get_localzone(_root=tz_path("localtime"))
+        assert isinstance(tz, tzlocal.mapped.MappedZone)
+        assert str(tz) == "local"
+        assert datetime(2026, 1, 1, tzinfo=tz).utcoffset() == timedelta(hours=2)
+        # Files are only loaded once
+        assert tzlocal.unix._get_localzone(_root=tz_path("localtime")) is tz
+        # Files outside the zoneinfo tree are read, not mapped, so rewriting them doesn't change the zone
+        assert isinstance(tz._data, bytes)
+
+        zoneinfo_dir = tmp_path / "zoneinfo"
+        zoneinfo_dir.mkdir()
+        (zoneinfo_dir / "Harare").write_bytes(Path(tz_path("Africa/Harare")).read_bytes())
+        localtime = tmp_path / "localtime"
+        localtime.write_bytes(Path(tz_path("Africa/Harare")).read_bytes())
+        monkeypatch.setattr("zoneinfo.TZPATH", (str(zoneinfo_dir),))
+        assert isinstance(tzlocal.mapped.load(str(zoneinfo_dir / "Harare"))._data, mmap.mmap)
+        tz = tzlocal.mapped.load(str(localtime))
+        localtime.write_bytes(b"")
+        assert datetime(2026, 1, 1, tzinfo=tz).utcoffset() == timedelta(hours=2)
+
+        with pytest.raises(ValueError):
+            tzlocal.utils.set_zone_loader("pickle")
+    finally:
+        tzlocal.utils.set_zone_loader()
+    assert isinstance(tzlocal.utils._tz_from_file(tz_path("Africa/Harare"), key="Africa/Harare"), ZoneInfo)
+
+
+@pytest.mark.parametrize("key", ["Europe/Amsterdam", "America/New_York", "Australia/Lord_Howe", "Asia/Kolkata"])
+def test_vectorized(key):
+    np = pytest.importorskip("numpy")
+    import tzlocal.vectorized
+
+    tz = ZoneInfo(key)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    # Every week and a bit, from 1900 to 2150
+    seconds = np.arange(-2208988800, 5680281600, 611273, dtype=np.int64)
+
+    offsets = tzlocal.vectorized.utc_offsets(seconds, tz)
+    expected = [(epoch + timedelta(seconds=int(s))).astimezone(tz).utcoffset().total_seconds() for s in seconds]
+    assert offsets.tolist() == expected
+    assert (tzlocal.vectorized.utc_to_local(seconds, tz) == seconds + offsets).all()
+
+    for fold in (0, 1):
+        utc = tzlocal.vectorized.local_to_utc(seconds, tz, fold=fold)
+        expected = [
+            ((datetime(1970, 1, 1) + timedelta(seconds=int(s))).replace(tzinfo=tz, fold=fold) - epoch).total_seconds()
+            for s in seconds
+        ]
+        assert utc.tolist() == expected
+
+
+def test_vectorized_datetime64():
+    np = pytest.importorskip("numpy")
+    import tzlocal.vectorized
+
+    tz = ZoneInfo("Europe/Amsterdam")
+    times = np.array(["2024-01-01T12:00:00.250", "2024-07-01T12:00:00.250", "NaT"], dtype="datetime64[ms]")
+    local = tzlocal.vectorized.utc_to_local(times, tz)
+    assert local.dtype == times.dtype
+    assert local[:2].tolist() == [datetime(2024, 1, 1, 13, 0, 0, 250000), datetime(2024, 7, 1, 14, 0, 0, 250000)]
+    assert np.isnat(local[2])
+    assert (tzlocal.vectorized.local_to_utc(local, tz)[:2] == times[:2]).all()
+    assert tzlocal.vectorized.utc_offsets(times, tz).tolist() == [3600, 7200, 0]
+
+    # 02:30 doesn't exist on the last Sunday of March, and happens twice on the last Sunday of October
+    unclear = np.array(["2024-03-31T02:30", "2024-10-27T02:30"], dtype="datetime64[s]")
+    assert tzlocal.vectorized.local_to_utc(unclear, tz, fold=0).tolist() == [
+        datetime(2024, 3, 31, 1, 30),
+        datetime(2024, 10, 27, 0, 30),
+    ]
+    assert tzlocal.vectorized.local_to_utc(unclear, tz, fold=1).tolist() == [
+        datetime(2024, 3, 31, 0, 30),
+        datetime(2024, 10, 27, 1, 30),
+    ]
+    with pytest.raises(ValueError):
+        tzlocal.vectorized.local_to_utc(unclear[:1], tz, strict=True)
+    with pytest.raises(ValueError):
+        tzlocal.vectorized.local_to_utc(unclear, tz, fold=2)
+    with pytest.raises(TypeError):
+        tzlocal.vectorized.utc_offsets(np.array([1.5]), tz)
+
+    # Fixed offset timezones work too, and the default is the local zone
+    assert tzlocal.vectorized.utc_offsets(times[:1], timezone(timedelta(hours=-3))).tolist() == [-10800]
+    assert tzlocal.vectorized.utc_offsets(times[:1]).shape == (1,)
+
+
+@pytest.mark.parametrize("key", ["Europe/Amsterdam", "America/New_York", "Australia/Lord_Howe", "Asia/Kolkata", "UTC"])
+def test_transition_table(key):
+    tz = ZoneInfo(key)
+    table = tzlocal.transitions.transition_table(tz)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    for seconds in range(-2208988800, 4102444800, 604801):
+        when = (epoch + timedelta(seconds=seconds)).astimezone(tz)
+        assert table.offset_at(seconds) == when.utcoffset().total_seconds()
+        assert table.dst_at(seconds) == when.dst().total_seconds()
+        assert table.abbreviation_at(seconds) == when.tzname()
+
+    # The table is read-only
+    with pytest.raises(TypeError):
+        table.utcoffsets[0] = 0
+    rows = list(table)
+    assert len(rows) == len(table)
+    if rows:
+        assert rows[0] == (table.transitions[0], table.utcoffsets[1], table.dst[1], table.abbreviation_indices[1])
+
+
+def test_transition_table_range(monkeypatch):
+    tz = ZoneInfo("Europe/Amsterdam")
+    table = tzlocal.transitions.transition_table(tz, 2024, 2025)
+    assert len(table) == 4
+    assert table.abbreviations == ("CET", "CEST")
+    assert table.start == datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert table.end == datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp() - 1
+    assert table.offset_at(table.start) == 3600
+    assert table.offset_at(table.end) == 3600
+    assert table.offset_at(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp()) == 7200
+    with pytest.raises(ValueError):
+        table.offset_at(table.start - 1)
+    with pytest.raises(ValueError):
+        table.offset_at(table.end + 1)
+    with pytest.raises(ValueError):
+        tzlocal.transitions.transition_table(tz, 2025, 2024)
+
+    # Far future years are calculated from the rules
+    table = tzlocal.transitions.transition_table(tz, 3000, 3000)
+    assert len(table) == 2
+    assert table.offset_at(datetime(3000, 7, 1, tzinfo=timezone.utc).timestamp()) == 7200
+
+    # Zones without rules for the future have no end
+    table = tzlocal.transitions.transition_table(timezone(timedelta(hours=2)))
+    assert (len(table), table.start, table.end) == (0, None, None)
+    assert table.offset_at(10**11) == 7200
+
+    # The default is the local zone
+    monkeypatch.setattr(tzlocal, "get_localzone", lambda: tz, raising=False)
+    assert tzlocal.transitions.transition_table(start_year=2024, end_year=2024).abbreviations == ("CET", "CEST")
+
+
+def test_year_cache(monkeypatch):
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    for tz in (ZoneInfo("Europe/Amsterdam"), ZoneInfo("Australia/Lord_Howe"), tzlocal.posix.parse("EST5EDT")):
+        cache = tzlocal.transitions.YearCache(tz, maxsize=3)
+        # Far in the past, in the table, and far in the future
+        for seconds in range(-30000000000, 20000000000, 86400 * 97 + 3607):
+            expected = (epoch + timedelta(seconds=seconds)).astimezone(tz).utcoffset().total_seconds()
+            start, end, offset = cache.interval_at(seconds)
+            assert offset == expected
+            assert start is None or start <= seconds
+            assert end is None or seconds < end
+        assert len(cache) == 3
+
+    # POSIX TZ strings use the rules before 1900 too
+    cache = tzlocal.transitions.YearCache(tzlocal.posix.parse("EST5EDT"))
+    assert cache.offset_at(datetime(1500, 7, 1, tzinfo=timezone.utc).timestamp()) == -4 * 3600
+    # The interval ends where the year bucket ends
+    start, end, offset = cache.interval_at(datetime(2500, 12, 1, tzinfo=timezone.utc).timestamp())
+    assert offset == -5 * 3600
+    assert end - start < 86400 * 366
+    with pytest.raises(ValueError):
+        cache.offset_at(-(10**12))
+    with pytest.raises(ValueError):
+        tzlocal.transitions.YearCache(timezone.utc, maxsize=0)
+
+    # The cache of a zone is shared, and the default is the local zone
+    tz = ZoneInfo("Europe/Amsterdam")
+    assert tzlocal.transitions.year_cache(tz) is tzlocal.transitions.year_cache(tz)
+    monkeypatch.setattr(tzlocal, "get_localzone", lambda: tz, raising=False)
+    assert tzlocal.transitions.year_cache() is tzlocal.transitions.year_cache(tz)
+
+
+def test_stamp(mocker):
+    tz = ZoneInfo("Europe/Amsterdam")
+    start = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+    timestamps = list(range(start, start + 366 * 86400, 2221))
+    expected = [datetime.fromtimestamp(timestamp, tz).isoformat() for timestamp in timestamps]
+    assert list(tzlocal.stamping.stamp(timestamps, tz)) == expected
+
+    # The offset is only looked up again when a timestamp crosses a transition
+    stamper = tzlocal.stamping.Stamper(tz)
+    lookup = mocker.spy(stamper, "_lookup")
+    assert [stamper(timestamp) for timestamp in timestamps] == expected
+    assert lookup.call_count == 3
+    # Out of order timestamps work too
+    assert stamper(start + 0.5) == "2024-01-01T01:00:00.500000+01:00"
+    assert lookup.call_count == 4
+
+    stamps = tzlocal.stamping.stamp([start, start + 200 * 86400], tz, output="tuple")
+    assert list(stamps) == [(start + 3600, 3600), (start + 200 * 86400 + 7200, 7200)]
+
+    records = [{"time": start, "message": "Hello"}]
+    stamps = tzlocal.stamping.stamp(records, tz, key=lambda record: record["time"], timespec="minutes")
+    assert list(stamps) == [(records[0], "2024-01-01T01:00+01:00")]
+
+    # Offsets that aren't whole minutes, and far future times
+    stamps = tzlocal.stamping.stamp([-2000000000, 10**10], tz)
+    assert list(stamps) == ["1906-08-16T20:46:12+00:19:32", "2286-11-20T18:46:40+01:00"]
+
+    with pytest.raises(ValueError):
+        tzlocal.stamping.Stamper(tz, output="nonsense")
+
+
+def test_astamp():
+    async def timestamps():
+        for timestamp in (0, 15552000):
+            yield timestamp
+
+    async def stamp_all():
+        return [stamped async for stamped in tzlocal.stamping.astamp(timestamps(), timezone.utc, output="tuple")]
+
+    assert asyncio.run(stamp_all()) == [(0, 0), (15552000, 0)]
+
+
+def test_verification_policy(mocker, monkeypatch):
+    check = mocker.patch("tzlocal.utils.assert_tz_offset")
+    tz = ZoneInfo("Africa/Harare")
+    try:
+        tzlocal.utils.set_verification_policy("always")
+        assert tzlocal.utils._check_tz_offset(tz)
+        assert tzlocal.utils._check_tz_offset(tz)
+        assert check.call_count == 2
+
+        tzlocal.utils.set_verification_policy("never")
+        assert not tzlocal.utils._check_tz_offset(tz)
+        assert check.call_count == 2
+
+        tzlocal.utils.set_verification_policy("once")
+        assert tzlocal.utils._check_tz_offset(tz)
+        assert not tzlocal.utils._check_tz_offset(tz)
+        # A new zone is checked again
+        assert tzlocal.utils._check_tz_offset(ZoneInfo("UTC"))
+        assert check.call_count == 4
+
+        tzlocal.utils.set_verification_policy("interval", interval=60)
+        now = datetime(2024, 3, 31, 0, 59, 30, tzinfo=timezone.utc).timestamp()
+        monkeypatch.setattr(tzlocal.utils.time, "time", lambda: now)
+        amsterdam = ZoneInfo("Europe/Amsterdam")
+        assert tzlocal.utils._check_tz_offset(amsterdam)
+        assert not tzlocal.utils._check_tz_offset(amsterdam)
+        # The verification ends at the transition, 30 seconds later, before the interval is up
+        now += 30
+        assert tzlocal.utils._check_tz_offset(amsterdam)
+        now += 59
+        assert not tzlocal.utils._check_tz_offset(amsterdam)
+        now += 1
+        assert tzlocal.utils._check_tz_offset(amsterdam)
+        assert check.call_count == 7
+
+        with pytest.raises(ValueError):
+            tzlocal.utils.set_verification_policy("sometimes")
+        for interval in (float("inf"), float("nan"), None, 0, -1, "60"):
+            with pytest.raises(ValueError):
+                tzlocal.utils.set_verification_policy("interval", interval=interval)
+    finally:
+        tzlocal.utils.set_verification_policy()
+
+
+def test_win32_verification(mocker, monkeypatch):
+    if sys.platform != "win32":
+        winreg = MagicMock()
+        monkeypatch.setitem(sys.modules, "winreg", winreg)
+    import tzlocal.win32
+
+    monkeypatch.setattr(tzlocal.win32, "_cache_tz", ZoneInfo("Africa/Harare"))
+    check = mocker.patch("tzlocal.utils.assert_tz_offset")
+    tzlocal.utils.set_verification_policy()
+    for _ in range(10):
+        tzlocal.win32.get_localzone()
+    assert check.call_count == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+def test_disk_cache(mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert tzlocal.diskcache.default_directory() == str(tmp_path / "tzlocal")
+    lookup = mocker.patch("tzlocal.unix._get_localzone_name", return_value="Africa/Harare")
+    tzlocal.unix.set_disk_cache()
+    try:
+        assert tzlocal.unix._lookup_localzone_name() == "Africa/Harare"
+        assert lookup.call_count == 1
+        # Another process would find it on disk
+        assert tzlocal.unix._lookup_localzone_name() == "Africa/Harare"
+        assert lookup.call_count == 1
+        assert (tmp_path / "tzlocal").stat().st_mode & 0o777 == 0o700
+
+        # A changed configuration means looking it up again
+        monkeypatch.setenv("TZ", "Europe/Warsaw")
+        lookup.return_value = "Europe/Warsaw"
+        assert tzlocal.unix._lookup_localzone_name() == "Europe/Warsaw"
+        assert lookup.call_count == 2
+
+        # Other roots, and traces, don't use the disk cache
+        tzlocal.unix._lookup_localzone_name(_root=tz_path("timezone"))
+        tzlocal.unix._lookup_localzone_name(_trace=tzlocal.unix.ResolutionTrace("/"))
+        assert lookup.call_count == 4
+
+        # Directories others can write to are not trusted
+        (tmp_path / "tzlocal").chmod(0o777)
+        assert tzlocal.diskcache.load(str(tmp_path / "tzlocal"), tzlocal.unix._fingerprint()) == (False, None)
+        (tmp_path / "tzlocal").chmod(0o700)
+        assert tzlocal.diskcache.load(str(tmp_path / "tzlocal"), tzlocal.unix._fingerprint()) == (
+            True,
+            "Europe/Warsaw",
+        )
+
+        # Broken cache files are ignored
+        (tmp_path / "tzlocal" / "localzone.json").write_text("{broken")
+        assert tzlocal.unix._lookup_localzone_name() == "Europe/Warsaw"
+        assert lookup.call_count == 5
+    finally:
+        tzlocal.unix.set_disk_cache(False)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_disk_cache_processes(tmp_path):
+    directory = str(tmp_path / "tzlocal")
+    fingerprint = ("Africa/Harare", None)
+    tzlocal.diskcache.store(directory, fingerprint, "Africa/Harare")
+
+    # Many processes writing and reading at once always read a whole file
+    pids = []
+    for _ in range(8):
+        pid = os.fork()
+        if pid == 0:
+            ok = True
+            for _ in range(50):
+                tzlocal.diskcache.store(directory, fingerprint, "Africa/Harare")
+                ok = ok and tzlocal.diskcache.load(directory, fingerprint) == (True, "Africa/Harare")
+            os._exit(0 if ok else 1)
+        pids.append(pid)
+    assert [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids] == [0] * 8
+    assert os.listdir(directory) == ["localzone.json"]
+
+
+@pytest.fixture
+def syscalls(monkeypatch):
+    """Records the file system calls made on paths in tests/test_data, like strace would."""
+
+    calls = []
+
+    def wrap(name, function):
+        def wrapper(path, *args, **kwargs):
+            if str(os.fspath(path)).startswith(tz_path()):
+                calls.append((name, os.path.relpath(os.fspath(path), tz_path())))
+            return function(path, *args, **kwargs)
+
+        return wrapper
+
+    for name in ("stat", "lstat", "scandir", "readlink"):
+        monkeypatch.setattr(os, name, wrap(name, getattr(os, name)))
+    monkeypatch.setattr(builtins, "open", wrap("open", builtins.open))
+    return calls
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+@pytest.mark.parametrize(
+    "root,expected",
+    [
+        (
+            "timezone",
+            [
+                ("stat", "timezone/system/bin/getprop"),
+                ("scandir", "timezone/etc"),
+                ("open", "timezone/etc/timezone"),
+                ("open", "timezone/var/db/zoneinfo"),
+            ],
+        ),
+        (
+            "localtime",
+            [
+                ("stat", "localtime/system/bin/getprop"),
+                ("scandir", "localtime/etc"),
+                ("open", "localtime/var/db/zoneinfo"),
+                # Only opened once, to read the zone
+                ("open", "localtime/etc/localtime"),
+            ],
+        ),
+        (
+            "symlink_localtime",
+            [
+                ("stat", "symlink_localtime/system/bin/getprop"),
+                ("scandir", "symlink_localtime/etc"),
+                ("open", "symlink_localtime/var/db/zoneinfo"),
+                ("readlink", "symlink_localtime/etc/localtime"),
+                ("lstat", "symlink_localtime/usr/share/zoneinfo/Africa/Harare"),
+            ],
+        ),
+    ],
+)
+def test_probe_syscalls(root, expected, syscalls):
+    trace = tzlocal.unix.trace_localzone(_root=tz_path(root))
+    assert trace.error is None
+    assert syscalls == expected
+    assert trace.syscalls == len(expected)
+    assert sum(step.syscalls for step in trace.steps) == trace.syscalls
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("root", os.listdir(tz_path()))
+def test_probe_counts_all_syscalls(root, syscalls):
+    trace = tzlocal.unix.trace_localzone(_root=tz_path(root))
+    assert trace.syscalls == len(syscalls)
+    # Nothing is looked at twice
+    assert len(set(syscalls)) == len(syscalls)
+    # Conflicting configurations are compared with the alias table, without looking at any files
+    assert all(step.syscalls == 0 for step in trace.steps if step.step == "alias dedup")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+def test_probe_unlistable_etc(monkeypatch):
+    # etc/ can be traversed, but not listed, so the files are looked for one by one
+    scandir = os.scandir
+
+    def unlistable_scandir(path="."):
+        if os.path.basename(os.fspath(path)) == "etc":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", unlistable_scandir)
+    assert tzlocal.unix._get_localzone_name(_root=tz_path("timezone")) == "Africa/Harare"
+    assert tzlocal.unix._get_localzone_name(_root=tz_path("symlink_localtime")) == "Africa/Harare"
+
+
+def test_zone_name_from_path(mocker, monkeypatch, tmp_path):
+    # No timezones are created to check the names
+    mocker.patch("zoneinfo.ZoneInfo", side_effect=AssertionError("ZoneInfo() was called"))
+    zoneinfo_dir = tmp_path / "zoneinfo"
+    for name in ("Africa/Harare", "posix/Africa/Harare", "Etc/UTC", "UTC", "zone.tab", "posixrules"):
+        (zoneinfo_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (zoneinfo_dir / name).write_bytes(b"TZif")
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(tmp_path / "nowhere"), str(zoneinfo_dir)))
+    monkeypatch.setattr(tzlocal.zoneindex, "_listings", {})
+
+    find = tzlocal.zoneindex.zone_name_from_path
+    assert find("/usr/share/zoneinfo/Africa/Harare") == "Africa/Harare"
+    assert find("/usr/share/zoneinfo/posix/Africa/Harare") == "Africa/Harare"
+    assert find("/usr/share/zoneinfo/Etc/UTC") == "Etc/UTC"
+    assert find("/usr/share/zoneinfo/UTC") == "UTC"
+    assert find("/usr/share/zoneinfo/Africa/Nowhere") is None
+    assert find("/usr/share/zoneinfo/zone.tab") is None
+    assert find("/usr/share/zoneinfo/posixrules") is None
+    assert find("/usr/share/zoneinfo/Africa") is None
+
+    assert tzlocal.zoneindex.is_zone_key("Africa/Harare")
+    assert not tzlocal.zoneindex.is_zone_key("Africa/../UTC")
+    assert not tzlocal.zoneindex.is_zone_key("posix/Africa/Harare")
+    # Each directory was only listed once
+    assert sorted(tzlocal.zoneindex._listings) == sorted(
+        [str(tmp_path / "nowhere"), str(zoneinfo_dir), str(zoneinfo_dir / "Africa"), str(zoneinfo_dir / "Etc")]
+    )
+
+    # Listings that fail are not kept
+    other_dir = tmp_path / "other"
+    (other_dir / "Asia").mkdir(parents=True)
+    (other_dir / "Asia" / "Somewhere").write_bytes(b"TZif")
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(other_dir),))
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", Mock(side_effect=OSError(24, "Too many open files")))
+    assert not tzlocal.zoneindex.is_zone_key("Asia/Somewhere")
+    assert str(other_dir) not in tzlocal.zoneindex._listings
+    monkeypatch.setattr(os, "scandir", scandir)
+    assert tzlocal.zoneindex.is_zone_key("Asia/Somewhere")
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(tmp_path / "nowhere"), str(zoneinfo_dir)))
+
+    # The listings are forgotten together with the cached localzone
+    (zoneinfo_dir / "Africa" / "Somewhere").write_bytes(b"TZif")
+    assert not tzlocal.zoneindex.is_zone_key("Africa/Somewhere")
+    tzlocal.unix._clear_cache()
+    assert tzlocal.zoneindex._listings == {}
+    assert tzlocal.zoneindex.is_zone_key("Africa/Somewhere")
+
+
+def test_zone_index(mocker, monkeypatch, tmp_path):
+    zoneinfo_dir = tmp_path / "usr" / "share" / "zoneinfo"
+    for name in ("Africa/Harare", "Etc/UTC", "Europe/Paris", "posix/Africa/Harare", "zone.tab"):
+        (zoneinfo_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (zoneinfo_dir / name).write_bytes(b"TZif")
+    (zoneinfo_dir / "Africa" / "Maputo").symlink_to("Harare")
+    (zoneinfo_dir / "UTC").symlink_to("Etc/UTC")
+    (zoneinfo_dir / "Zulu").symlink_to("UTC")
+    os.link(zoneinfo_dir / "Europe" / "Paris", zoneinfo_dir / "Europe" / "Monaco")
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(zoneinfo_dir),))
+    monkeypatch.setattr(tzlocal.zoneindex, "_index", None)
+    monkeypatch.setattr(tzlocal.zoneindex, "_index_signature", None)
+
+    index = tzlocal.zoneindex.get_index()
+    assert index.names == {"Africa/Harare", "Africa/Maputo", "Etc/UTC", "Europe/Monaco", "Europe/Paris", "UTC", "Zulu"}
+    assert index.canonical_name("Africa/Maputo") == "Africa/Harare"
+    assert index.canonical_name("Zulu") == "Etc/UTC"
+    assert index.canonical_name("Europe/Paris") == index.canonical_name("Europe/Monaco")
+    assert index.canonical_name("Mars/Olympus_Mons") == "Mars/Olympus_Mons"
+    assert index.aliases("UTC") == ("Etc/UTC", "UTC", "Zulu")
+    assert index.utc_name() == "UTC"
+
+    # The index is only built once
+    assert tzlocal.zoneindex.get_index() is index
+
+    # And built again when TZPATH changes
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(zoneinfo_dir / "Africa"),))
+    other = tzlocal.zoneindex.get_index()
+    assert other.names == {"Harare", "Maputo"}
+    assert other.utc_name() is None
+
+    # Or when the directory changes
+    monkeypatch.setattr("zoneinfo.TZPATH", (str(zoneinfo_dir),))
+    assert tzlocal.zoneindex.get_index() is not other
+    index = tzlocal.zoneindex.get_index()
+    (zoneinfo_dir / "Etc" / "UCT").write_bytes(b"TZif")
+    os.utime(zoneinfo_dir, ns=(0, 0))
+    assert "Etc/UCT" in tzlocal.zoneindex.get_index()
+
+    # The unix lookup uses it for the UTC fallback, and to find configurations that are the same
+    assert tzlocal.unix._default_tz().key == "UTC"
+    mocker.patch("os.path.realpath", side_effect=AssertionError("realpath() was called"))
+    unique = tzlocal.unix._get_unique_tzs({"a": "Africa/Maputo", "b": "Africa/Harare"}, str(tmp_path))
+    assert unique == {"Africa/Harare"}
@@ -5,11 +5,27 @@ if sys.platform == "win32":
 else:
     from tzlocal.unix import get_localzone, get_localzone_name, reload_localzone
 
-from tzlocal.utils import assert_tz_offset
+from tzlocal.utils import assert_tz_offset, set_verification_policy, set_zone_loader
 
 __all__ = [
     "get_localzone",
     "get_localzone_name",
     "reload_localzone",
     "assert_tz_offset",
+    "set_verification_policy",
+    "set_zone_loader",
+    "get_localzone_async",
+    "get_localzone_name_async",
+    "reload_localzone_async",
 ]
+
+_async_functions = ("get_localzone_async", "get_localzone_name_async", "reload_localzone_async")
+
+
+def __getattr__(name):
+    # The asyncio functions are imported when used, as importing asyncio is slow.
+    if name in _async_functions:
+        from tzlocal import aio
+
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
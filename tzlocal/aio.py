@@ -0,0 +1,57 @@
+"""Asyncio versions of get_localzone(), get_localzone_name() and reload_localzone().
+
+Looking up the local timezone reads files and may even run a subprocess, so
+these run the lookup in the event loop's default executor, so that they
+don't block the event loop. They use the same cache as the blocking
+functions, and if the zone is already cached, and the configuration isn't
+due to be checked again, they return it directly.
+"""
+
+import asyncio
+import sys
+
+if sys.platform == "win32":
+    from tzlocal import win32 as _platform
+else:
+    from tzlocal import unix as _platform
+
+# Lookups that are running, per event loop, so that concurrent callers
+# can wait for the same lookup instead of starting new ones.
+_inflight = {}
+
+
+async def _run_once(function):
+    loop = asyncio.get_running_loop()
+    key = (loop, function.__name__)
+    future = _inflight.get(key)
+    if future is None:
+        future = loop.run_in_executor(None, function)
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield it, so that one caller getting cancelled doesn't cancel it for everyone
+    return await asyncio.shield(future)
+
+
+def _revalidation_due():
+    # Only the Unix configuration is revalidated
+    revalidation_due = getattr(_platform, "_revalidation_due", None)
+    return revalidation_due is not None and revalidation_due()
+
+
+async def get_localzone_name_async() -> str:
+    """Get the computers configured local timezone name, without blocking the event loop."""
+    if _platform._cache_tz_name is not None and not _revalidation_due():
+        return _platform.get_localzone_name()
+    return await _run_once(_platform.get_localzone_name)
+
+
+async def get_localzone_async():
+    """Get the computers configured local timezone, without blocking the event loop."""
+    if _platform._cache_tz is not None and not _revalidation_due():
+        return _platform.get_localzone()
+    return await _run_once(_platform.get_localzone)
+
+
+async def reload_localzone_async():
+    """Reload the cached localzone, without blocking the event loop."""
+    return await _run_once(_platform.reload_localzone)
@@ -0,0 +1,82 @@
+"""An on-disk cache of the local timezone name, shared between processes.
+
+Short-lived processes look up the timezone once each. With this cache, the
+name is saved together with the fingerprint of the configuration it was
+found in, and later processes only need a few stat() calls to check that the
+configuration is unchanged before using it.
+
+The cache file is replaced atomically, so processes can read and write it at
+the same time. It is only used in directories that belong to the current
+user and that nobody else can write to.
+"""
+
+import json
+import logging
+import os
+import stat
+import tempfile
+
+VERSION = 1
+CACHE_FILE = "localzone.json"
+
+log = logging.getLogger("tzlocal")
+
+
+def default_directory():
+    """$XDG_RUNTIME_DIR/tzlocal, or a per-user directory in the temp directory."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "tzlocal")
+    return os.path.join(tempfile.gettempdir(), f"tzlocal-{os.getuid()}")
+
+
+def _trusted(directory):
+    try:
+        st = os.lstat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _jsonable(fingerprint):
+    # Tuples become lists in JSON, so compare them as JSON would have them
+    return json.loads(json.dumps(fingerprint))
+
+
+def load(directory, fingerprint):
+    """Returns (True, name) if the cache has a name for this fingerprint, or (False, None)."""
+    if not _trusted(directory):
+        return False, None
+    try:
+        with open(os.path.join(directory, CACHE_FILE), encoding="utf-8") as cachefile:
+            entry = json.load(cachefile)
+    except (OSError, ValueError):
+        return False, None
+    if (
+        not isinstance(entry, dict)
+        or entry.get("version") != VERSION
+        or entry.get("fingerprint") != _jsonable(fingerprint)
+    ):
+        return False, None
+    log.debug("Found the timezone name in the disk cache in %s", directory)
+    return True, entry.get("name")
+
+
+def store(directory, fingerprint, name):
+    """Saves the name and fingerprint in the cache. Errors are logged and ignored."""
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not _trusted(directory):
+            log.debug("Not using %s for the disk cache, it can be written to by others", directory)
+            return
+        # Write to a temporary file and rename it, so nobody reads a half written file
+        handle, tmppath = tempfile.mkstemp(dir=directory, prefix=".localzone.", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as cachefile:
+                json.dump({"version": VERSION, "fingerprint": fingerprint, "name": name}, cachefile)
+            os.replace(tmppath, os.path.join(directory, CACHE_FILE))
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+    except OSError as e:
+        log.debug("Could not write the disk cache in %s: %s", directory, e)
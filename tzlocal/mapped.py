@@ -0,0 +1,300 @@
+"""A tzinfo that reads its transitions from a memory mapped TZif file.
+
+ZoneInfo.from_file() reads the whole file and keeps all of it as Python
+objects. MappedZone memory maps the file instead, and reads the transition
+times from the mapping when they are looked up, so the data stays in the
+page cache, shared with every other process that uses the same file. Only
+the local time types, of which there are a handful, are kept as objects.
+
+Only files in zoneinfo.TZPATH are memory mapped. A mapped file that is
+rewritten in place changes under the timezone, or crashes the process if it
+is truncated, and other files, like /etc/localtime, can be rewritten like
+that, for example with cp. Those are read into memory instead, and the
+transition times are read from the bytes the same way.
+
+The offsets are the same as ZoneInfo gives, as MappedZone follows what
+zoneinfo does for the times before the first transition, for wall times
+that happen twice or not at all, and to find the DST offsets. The times
+after the last transition are handled by a tzlocal.posix.PosixZone, from
+the POSIX TZ string at the end of the file.
+"""
+
+import bisect
+import datetime
+import functools
+import mmap
+import os
+import struct
+import zoneinfo
+
+from tzlocal import posix, tzif
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_NO_TYPE = (None, None, None)
+_unpack_times = {8: struct.Struct(">q").unpack_from, 4: struct.Struct(">l").unpack_from}
+
+
+# The same few offsets are used over and over, so they are shared, like zoneinfo does
+@functools.lru_cache(maxsize=512)
+def _timedelta(seconds):
+    return datetime.timedelta(seconds=seconds)
+
+
+def _local_timestamp(dt):
+    return (dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+
+class _Times:
+    """The big-endian transition times in the mapped file, as a sequence of ints."""
+
+    __slots__ = ("_buffer", "_length", "_size", "_start", "_unpack")
+
+    def __init__(self, buffer, start, length, size):
+        self._buffer = buffer
+        self._start = start
+        self._length = length
+        self._size = size
+        self._unpack = _unpack_times[size]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("transition index out of range")
+        return self._unpack(self._buffer, self._start + index * self._size)[0]
+
+
+class _WallTimes:
+    """The transition times in local time.
+
+    Like zoneinfo, the larger of the offsets before and after the transition
+    is used for fold=0, and the smaller for fold=1."""
+
+    __slots__ = ("_choose", "_indices", "_times", "_utcoffsets")
+
+    def __init__(self, times, indices, utcoffsets, fold):
+        self._times = times
+        self._indices = indices
+        self._utcoffsets = utcoffsets
+        self._choose = min if fold else max
+
+    def __len__(self):
+        return len(self._times)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._times)
+        after = self._utcoffsets[self._indices[index]]
+        before = self._utcoffsets[self._indices[index - 1]] if index else self._utcoffsets[0]
+        return self._times[index] + self._choose(before, after)
+
+
+def _dst_offsets(indices, utcoffsets, isdst):
+    """Works out the DST offset of each local time type, the same way zoneinfo does.
+
+    TZif files only say if a type is DST, so the offset is the difference to
+    the standard time before, or else after, the first transition to it."""
+    typecnt = len(isdst)
+    dstoffsets = [0] * typecnt
+    dst_count = sum(isdst)
+    dst_found = 0
+    for number in range(1, len(indices)):
+        if dst_count == dst_found:
+            break
+        index = indices[number]
+        if not isdst[index] or dstoffsets[index]:
+            continue
+        dstoffset = 0
+        other = indices[number - 1]
+        if not isdst[other]:
+            dstoffset = utcoffsets[index] - utcoffsets[other]
+        if not dstoffset and index < typecnt - 1 and number + 1 < len(indices):
+            other = indices[number + 1]
+            if not isdst[other]:
+                dstoffset = utcoffsets[index] - utcoffsets[other]
+        if dstoffset:
+            dst_found += 1
+            dstoffsets[index] = dstoffset
+    else:
+        for index in range(typecnt):
+            if not dstoffsets[index] and isdst[index]:
+                dstoffsets[index] = 3600
+    return dstoffsets
+
+
+class MappedZone(datetime.tzinfo):
+    """A timezone from a TZif file, see load().
+
+    data is the contents of the file, an mmap or bytes, and is used as long as
+    the timezone is. key is the name of the timezone, like with ZoneInfo."""
+
+    __slots__ = (
+        "__weakref__",
+        "_after",
+        "_before",
+        "_data",
+        "_indices",
+        "_last",
+        "_last_utc",
+        "_path",
+        "_times",
+        "_types",
+        "_wall",
+        "key",
+    )
+
+    def __init__(self, data, key=None, path=None):
+        layout = tzif._read_layout(data)
+        self._data = data
+        self._path = path
+        self.key = key
+
+        self._times = _Times(data, layout.transitions, layout.timecnt, layout.time_size)
+        self._indices = memoryview(data)[layout.indices : layout.indices + layout.timecnt]
+        utcoffsets, isdst, abbreviations = tzif._read_types(data, layout)
+        dstoffsets = _dst_offsets(self._indices, utcoffsets, isdst)
+        self._types = [
+            (_timedelta(utcoffset), _timedelta(dstoffset), abbreviation)
+            for utcoffset, dstoffset, abbreviation in zip(utcoffsets, dstoffsets, abbreviations)
+        ]
+        self._wall = (
+            _WallTimes(self._times, self._indices, utcoffsets, 0),
+            _WallTimes(self._times, self._indices, utcoffsets, 1),
+        )
+        # The wall time interval of the last lookup for each fold: (start, end, type)
+        self._last = [(0, 0, None), (0, 0, None)]
+        # The UTC interval of the last fromutc(): (start, end, type, shift)
+        self._last_utc = (0, 0, None, 0)
+
+        # The type before the first transition is the first standard time type, like in zoneinfo
+        self._before = next(
+            (self._types[number] for number in range(len(isdst)) if not isdst[number]),
+            self._types[self._indices[0]] if layout.timecnt else None,
+        )
+
+        # What is used after the last transition: a type, or a PosixZone with the rules of the footer
+        footer = tzif._read_footer(data, layout)
+        if footer is None:
+            if not self._types:
+                raise ValueError("No time zone information found.")
+            self._after = self._types[self._indices[-1]] if layout.timecnt else self._types[-1]
+        else:
+            self._after = posix.parse(footer)
+            if self._after.utcoffset(None) is not None:
+                # No daylight saving time, so just one type
+                self._after = (self._after.utcoffset(None), self._after.dst(None), self._after.tzname(None))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(key={self.key!r}, path={self._path!r})"
+
+    def __str__(self):
+        return self.key if self.key is not None else repr(self)
+
+    def __reduce__(self):
+        if self._path is None:
+            raise TypeError(f"Can't pickle {self!r}, it was not loaded from a file")
+        return load, (self._path, self.key)
+
+    def _find(self, dt):
+        if dt is None:
+            # Only timezones with a single offset have an offset without a time
+            after = self._after
+            if isinstance(after, tuple) and (not self._types or self._types == [after]):
+                return after
+            return _NO_TYPE
+
+        timestamp = _local_timestamp(dt)
+        start, end, tztype = self._last[dt.fold]
+        if start <= timestamp < end:
+            return tztype
+
+        wall = self._wall[dt.fold]
+        count = len(wall)
+        if count and timestamp < wall[0]:
+            return self._before
+        if not count or timestamp > wall[count - 1]:
+            after = self._after
+            return after if isinstance(after, tuple) else after._find(dt)
+
+        index = bisect.bisect_right(wall, timestamp)
+        tztype = self._types[self._indices[index - 1]]
+        if index < count:
+            # Most lookups are close to the one before
+            self._last[dt.fold] = (wall[index - 1], wall[index], tztype)
+        return tztype
+
+    def utcoffset(self, dt):
+        return self._find(dt)[0]
+
+    def dst(self, dt):
+        return self._find(dt)[1]
+
+    def tzname(self, dt):
+        return self._find(dt)[2]
+
+    def fromutc(self, dt):
+        if not isinstance(dt, datetime.datetime):
+            raise TypeError("fromutc() requires a datetime argument")
+        if dt.tzinfo is not self:
+            raise ValueError("dt.tzinfo is not self")
+
+        timestamp = _local_timestamp(dt)
+        start, end, tztype, shift = self._last_utc
+        if start <= timestamp < end:
+            dt += tztype[0]
+            return dt.replace(fold=1) if shift > timestamp - start else dt
+
+        times = self._times
+        count = len(times)
+        if count and timestamp < times[0]:
+            return dt + self._before[0]
+        if not count or timestamp > times[count - 1]:
+            after = self._after
+            if not isinstance(after, tuple):
+                return after.fromutc(dt.replace(tzinfo=after)).replace(tzinfo=self)
+            if not count:
+                return dt + after[0]
+
+        index = bisect.bisect_right(times, timestamp)
+        tztype = self._types[self._indices[index - 1]]
+        previous = self._types[self._indices[index - 2]] if index > 1 else self._before
+        # The first hour or so after the clocks are turned back is the second of those wall times
+        start = times[index - 1]
+        shift = (previous[0] - tztype[0]).total_seconds()
+        if index < count:
+            self._last_utc = (start, times[index], tztype, shift)
+        dt += tztype[0]
+        return dt.replace(fold=1) if shift > timestamp - start else dt
+
+
+def _in_tzpath(path):
+    path = os.path.realpath(path)
+    for tzpath in zoneinfo.TZPATH:
+        tzpath = os.path.realpath(tzpath)
+        if os.path.commonpath([path, tzpath]) == tzpath:
+            return True
+    return False
+
+
+def _map(path):
+    """Memory maps the file if it's in the zoneinfo tree, and reads it otherwise.
+
+    Reading a mapping of a file that has been truncated kills the process
+    with SIGBUS, and a file that is rewritten changes under the timezone.
+    Package managers replace the files in zoneinfo.TZPATH instead of
+    rewriting them, but other files, like /etc/localtime, are often
+    rewritten in place, so those are read into memory."""
+    with open(path, "rb") as tzfile:
+        if _in_tzpath(path):
+            return mmap.mmap(tzfile.fileno(), 0, access=mmap.ACCESS_READ)
+        return tzfile.read()
+
+
+def load(path, key=None):
+    """Returns a MappedZone for the TZif file at path.
+
+    Only files in zoneinfo.TZPATH are memory mapped, see _map()."""
+    return MappedZone(_map(path), key, path)
@@ -0,0 +1,239 @@
+"""Timezones from POSIX TZ strings, like "CET-1CEST,M3.5.0,M10.5.0/3".
+
+The TZ environment variable can hold a rule like this instead of a timezone
+name, which embedded systems and containers often use, and TZif files end
+with one, for the times after their last transition. parse() compiles the
+string into a PosixZone, a tzinfo that calculates when daylight saving time
+starts and ends in a year once, and keeps that for the next lookups.
+
+The transitions are calculated the same way as zoneinfo does for the rules
+at the end of TZif files, so the results are the same as with ZoneInfo.
+"""
+
+import calendar
+import collections
+import datetime
+import functools
+import re
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+# When there is a daylight saving time name but no rules, the US rules are used, like glibc does
+DEFAULT_RULES = "M3.2.0,M11.1.0"
+# How many years of daylight saving time periods a PosixZone keeps, like transitions.YearCache
+YEAR_CACHE_SIZE = 32
+
+_abbreviation = r"[A-Za-z]{3,}|<[A-Za-z0-9+-]{3,}>"
+_offset = r"[+-]?\d{1,2}(?::\d{2}(?::\d{2})?)?"
+_tz_re = re.compile(
+    rf"(?P<std>{_abbreviation})(?P<stdoff>{_offset})(?:(?P<dst>{_abbreviation})(?P<dstoff>{_offset})?"
+    r"(?:,(?P<start>[^,]+),(?P<end>[^,]+))?)?",
+    re.ASCII,
+)
+_rule_re = re.compile(
+    r"(?:M(?P<month>\d{1,2})\.(?P<week>\d)\.(?P<weekday>\d)|J(?P<julian>\d{1,3})|(?P<day>\d{1,3}))"
+    r"(?:/(?P<time>[+-]?\d{1,3}(?::\d{2}(?::\d{2})?)?))?",
+    re.ASCII,
+)
+
+
+def _seconds(text):
+    sign = -1 if text.startswith("-") else 1
+    hours, minutes, seconds = (int(part) for part in (text.lstrip("+-").split(":") + ["0", "0"])[:3])
+    if minutes > 59 or seconds > 59:
+        raise ValueError(f"Invalid time: {text}")
+    return sign * (hours * 3600 + minutes * 60 + seconds)
+
+
+def _days_before_year(year):
+    """The number of days from 1970-01-01 to the last day of the year before."""
+    return datetime.date(year, 1, 1).toordinal() - _EPOCH_ORDINAL - 1
+
+
+def _compile_rule(rule):
+    """Compiles a start or end rule into a function, which returns the local time of it in a year.
+
+    The local time is in seconds since the epoch, and the transition time
+    defaults to 02:00."""
+    match = _rule_re.fullmatch(rule)
+    if match is None:
+        raise ValueError(f"Invalid start or end rule: {rule}")
+    time = 7200 if match["time"] is None else _seconds(match["time"])
+    if not -167 * 3600 <= time <= 167 * 3600:
+        raise ValueError(f"The hour must be between -167 and 167: {rule}")
+
+    if match["month"] is not None:
+        month, week, weekday = int(match["month"]), int(match["week"]), int(match["weekday"])
+        if not (1 <= month <= 12 and 1 <= week <= 5 and 0 <= weekday <= 6):
+            raise ValueError(f"Invalid start or end rule: {rule}")
+
+        def at(year):
+            # The first of the given weekday in the month, where Sunday is 0, then the nth week of it,
+            # where week 5 is the last one in the month.
+            first_weekday, days_in_month = calendar.monthrange(year, month)
+            day = (weekday - (first_weekday + 1)) % 7 + 1 + (week - 1) * 7
+            if day > days_in_month:
+                day -= 7
+            return (datetime.date(year, month, day).toordinal() - _EPOCH_ORDINAL) * 86400 + time
+
+        return at
+
+    if match["julian"] is not None:
+        day = int(match["julian"])
+        if not 1 <= day <= 365:
+            raise ValueError(f"The Julian day must be between 1 and 365: {rule}")
+
+        def at(year):
+            # February 29th is not counted
+            leap = day >= 60 and calendar.isleap(year)
+            return (_days_before_year(year) + day + leap) * 86400 + time
+
+        return at
+
+    day = int(match["day"])
+    if not 0 <= day <= 365:
+        raise ValueError(f"The day must be between 0 and 365: {rule}")
+
+    def at(year):
+        return (_days_before_year(year) + day) * 86400 + time
+
+    return at
+
+
+class PosixZone(datetime.tzinfo):
+    """A timezone from a POSIX TZ string, see parse()."""
+
+    __slots__ = ("__weakref__", "_dst", "_dst_diff", "_end", "_start", "_std", "_years", "key")
+
+    def __init__(self, tzstring):
+        match = _tz_re.fullmatch(tzstring)
+        if match is None:
+            raise ValueError(f"{tzstring} is not a valid POSIX TZ string")
+        #: The TZ string
+        self.key = tzstring
+
+        # The offsets in TZ strings are the other way around, west of UTC is positive
+        std_offset = -_seconds(match["stdoff"])
+        dst_offset = std_offset + 3600 if match["dstoff"] is None else -_seconds(match["dstoff"])
+        for offset in (std_offset, dst_offset):
+            if abs(offset) > 24 * 3600:
+                raise ValueError(f"Offsets must be between -24 and 24 hours: {tzstring}")
+        self._std = (datetime.timedelta(seconds=std_offset), datetime.timedelta(0), match["std"].strip("<>"))
+        self._dst = None
+        # The periods of the most recently used years: year -> periods
+        self._years = collections.OrderedDict()
+        if match["dst"] is None:
+            return
+
+        self._dst_diff = dst_offset - std_offset
+        self._dst = (
+            datetime.timedelta(seconds=dst_offset),
+            datetime.timedelta(seconds=self._dst_diff),
+            match["dst"].strip("<>"),
+        )
+        start, end = (match["start"], match["end"]) if match["start"] else DEFAULT_RULES.split(",")
+        self._start = _compile_rule(start)
+        self._end = _compile_rule(end)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.key!r})"
+
+    def __str__(self):
+        return self.key
+
+    def __reduce__(self):
+        return parse, (self.key,)
+
+    def _year(self, year):
+        """The daylight saving time periods of a year, calculated once for each year.
+
+        Returns the start and end of DST in local time for fold=0 and fold=1,
+        and in UTC, with the ambiguous times after it ends, for fromutc().
+        The YEAR_CACHE_SIZE most recently used years are kept."""
+        periods = self._years.get(year)
+        if periods is not None:
+            try:
+                self._years.move_to_end(year)
+            except KeyError:
+                # Another thread removed it just now, which is fine, it's calculated again when needed
+                pass
+        else:
+            start, end = self._start(year), self._end(year)
+            diff = self._dst_diff
+            # In local time the gap and fold around the transitions belong to
+            # standard or daylight saving time depending on the fold, and on
+            # if DST is ahead of standard time, which it almost always is.
+            if diff >= 0:
+                local = ((start + diff, end), (start, end - diff))
+            else:
+                local = ((start, end - diff), (start + diff, end))
+            utc_start = start - int(self._std[0].total_seconds())
+            utc_end = end - int(self._dst[0].total_seconds())
+            if diff > 0:
+                ambiguous = (utc_end, utc_end + diff)
+            else:
+                ambiguous = (utc_start, utc_start - diff)
+            periods = (local, (utc_start, utc_end), ambiguous)
+            self._years[year] = periods
+            while len(self._years) > YEAR_CACHE_SIZE:
+                try:
+                    self._years.popitem(last=False)
+                except KeyError:
+                    # Another thread emptied it
+                    break
+        return periods
+
+    def _find(self, dt):
+        if self._dst is None:
+            return self._std
+        if dt is None:
+            return (None, None, None)
+        timestamp = (dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+        start, end = self._year(dt.year)[0][dt.fold]
+        return self._dst if _between(start, end, timestamp) else self._std
+
+    def utcoffset(self, dt):
+        return self._find(dt)[0]
+
+    def dst(self, dt):
+        return self._find(dt)[1]
+
+    def tzname(self, dt):
+        return self._find(dt)[2]
+
+    def fromutc(self, dt):
+        if not isinstance(dt, datetime.datetime):
+            raise TypeError("fromutc() requires a datetime argument")
+        if dt.tzinfo is not self:
+            raise ValueError("dt.tzinfo is not self")
+        if self._dst is None:
+            return dt + self._std[0]
+
+        timestamp = (dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+        _, (start, end), (ambiguous_start, ambiguous_end) = self._year(dt.year)
+        dt += (self._dst if _between(start, end, timestamp) else self._std)[0]
+        if ambiguous_start <= timestamp < ambiguous_end:
+            return dt.replace(fold=1)
+        return dt
+
+    def transitions(self, year):
+        """Returns the UTC times, in seconds since the epoch, when DST starts and ends in the year.
+
+        Returns an empty tuple if the timezone has no daylight saving time."""
+        if self._dst is None:
+            return ()
+        return self._year(year)[1]
+
+
+def _between(start, end, timestamp):
+    # In the southern hemisphere DST starts late in the year and ends early in the next
+    if start < end:
+        return start <= timestamp < end
+    return not end <= timestamp < start
+
+
+@functools.lru_cache(maxsize=64)
+def parse(tzstring):
+    """Returns a PosixZone for a POSIX TZ string, or raises ValueError if it isn't one.
+
+    Parsing the same string again returns the same object."""
+    return PosixZone(tzstring)
@@ -0,0 +1,90 @@
+"""Stamping streams of UTC timestamps with the local time.
+
+Log lines and events usually come more or less sorted, so almost every
+timestamp has the same UTC offset as the one before it. stamp() and astamp()
+remember the interval between the two transitions around the last timestamp,
+and only look up the offset again when a timestamp falls outside it, instead
+of calling astimezone() for each one.
+"""
+
+import datetime
+
+from tzlocal import transitions
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_INFINITY = float("inf")
+OUTPUTS = ("iso", "tuple")
+
+
+def _format_offset(offset):
+    sign = "-" if offset < 0 else "+"
+    hours, rest = divmod(abs(offset), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if seconds:
+        return f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+class Stamper:
+    """Converts UTC timestamps, in seconds since the epoch, to local time in tz.
+
+    Calling it with a timestamp returns the local time as an ISO 8601 string,
+    or with output="tuple", a tuple of the wall time in seconds since the
+    epoch and the UTC offset in seconds. tz defaults to get_localzone()."""
+
+    def __init__(self, tz=None, output="iso", timespec="auto"):
+        if output not in OUTPUTS:
+            raise ValueError(f"output must be one of {', '.join(OUTPUTS)}, not {output!r}")
+        if tz is None:
+            from tzlocal import get_localzone
+
+            tz = get_localzone()
+        self.tz = tz
+        self.output = output
+        self.timespec = timespec
+        self._cache = transitions.year_cache(tz)
+        # The interval of the last timestamp, which is empty to begin with
+        self._start = self._end = 0
+        self._offset = 0
+        self._suffix = ""
+
+    def _lookup(self, timestamp):
+        start, end, offset = self._cache.interval_at(timestamp)
+        self._start = -_INFINITY if start is None else start
+        self._end = _INFINITY if end is None else end
+        self._offset = offset
+        self._suffix = _format_offset(offset)
+
+    def __call__(self, timestamp):
+        if not self._start <= timestamp < self._end:
+            self._lookup(timestamp)
+        wall = timestamp + self._offset
+        if self.output == "tuple":
+            return wall, self._offset
+        return (_EPOCH + datetime.timedelta(seconds=wall)).isoformat(timespec=self.timespec) + self._suffix
+
+
+def stamp(items, tz=None, output="iso", key=None, timespec="auto"):
+    """Yields the local time of each UTC timestamp in items.
+
+    The timestamps are seconds since the epoch. If key is given, the items
+    are records, and key is called to get the timestamp of each record, and
+    (record, local time) tuples are yielded. See Stamper for the output."""
+    stamper = Stamper(tz, output, timespec)
+    if key is None:
+        for timestamp in items:
+            yield stamper(timestamp)
+    else:
+        for record in items:
+            yield record, stamper(key(record))
+
+
+async def astamp(items, tz=None, output="iso", key=None, timespec="auto"):
+    """Like stamp(), but for async iterables."""
+    stamper = Stamper(tz, output, timespec)
+    if key is None:
+        async for timestamp in items:
+            yield stamper(timestamp)
+    else:
+        async for record in items:
+            yield record, stamper(key(record))
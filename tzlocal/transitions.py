@@ -0,0 +1,383 @@
+"""Precomputed tables of the transitions of a timezone.
+
+Getting the UTC offset of a time with datetime means creating a datetime
+object for each lookup. A TransitionTable holds the transitions of a timezone
+in compact arrays instead, so looking up the offset of a time is a binary
+search, without creating any objects.
+"""
+
+import bisect
+import collections
+import datetime
+import os
+import threading
+import weakref
+from array import array
+
+from tzlocal import posix, tzif, utils
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# Rules for the times after the last transition are followed until this year by default
+DEFAULT_END_YEAR = 2100
+MIN_YEAR = 1
+MAX_YEAR = 9998
+# How many years of transitions a YearCache keeps by default
+YEAR_CACHE_SIZE = 32
+_BUCKET_SECONDS = 31556952
+
+# The transitions of timezones, found so far: tz -> _History
+_histories = weakref.WeakKeyDictionary()
+_histories_lock = threading.Lock()
+
+# The shared YearCache of timezones: tz -> YearCache
+_year_caches = weakref.WeakKeyDictionary()
+_year_caches_lock = threading.Lock()
+
+
+def _year_start(year):
+    return int((datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc) - _EPOCH).total_seconds())
+
+
+def _year(timestamp):
+    return (_EPOCH + datetime.timedelta(seconds=timestamp)).year
+
+
+# The YearCache buckets that are within the years MIN_YEAR to MAX_YEAR
+_FIRST_BUCKET = -(-_year_start(MIN_YEAR) // _BUCKET_SECONDS)
+_LAST_BUCKET = _year_start(MAX_YEAR + 1) // _BUCKET_SECONDS - 1
+
+
+def _at(tz, timestamp):
+    return (_EPOCH + datetime.timedelta(seconds=timestamp)).astimezone(tz)
+
+
+def _seconds(delta):
+    return 0 if delta is None else int(delta.total_seconds())
+
+
+def _rule_transitions(rules, start, end):
+    """The transitions of a PosixZone after start, until end."""
+    first = _year(start) - 1
+    last = _year(end) + 1
+    found = []
+    for year in range(max(first, MIN_YEAR), min(last, MAX_YEAR + 1) + 1):
+        for timestamp in sorted(rules.transitions(year)):
+            if not start < timestamp <= end:
+                continue
+            # A rule can start DST when it already is DST, which isn't a transition
+            if utils._utcoffset(rules, timestamp - 1) != utils._utcoffset(rules, timestamp):
+                found.append(timestamp)
+    return found
+
+
+class _History:
+    """All transitions of a timezone, until end, or forever if end is None."""
+
+    def __init__(self, tz, end):
+        data = tzif.zone_data(tz)
+        rules = None
+        if data is not None:
+            transitions = list(data.transitions)
+            start = transitions[-1] if transitions else 0
+            if data.footer is None or "," not in data.footer:
+                # No rules for daylight saving time, so the last offset is used forever
+                end = None
+            else:
+                rules = posix.parse(data.footer)
+        elif tz.utcoffset(None) is not None:
+            # A fixed offset timezone
+            transitions = []
+            start = end = None
+        else:
+            transitions = []
+            start = _year_start(1900)
+            if isinstance(tz, posix.PosixZone):
+                rules = tz
+
+        if end is not None:
+            if rules is not None:
+                # The transitions can be calculated from the rules
+                transitions.extend(_rule_transitions(rules, start, end))
+            else:
+                # Some other tzinfo, we have to ask it for all transitions
+                transitions.extend(utils._probe(tz, start, end))
+
+        # Ask the timezone what applies after each transition, so everything
+        # is exactly what the timezone itself says.
+        self.end = end
+        self.transitions = transitions
+        self.infos = []
+        for timestamp in [transitions[0] - 1 if transitions else 0, *transitions]:
+            when = _at(tz, timestamp)
+            self.infos.append((_seconds(when.utcoffset()), _seconds(when.dst()), when.tzname()))
+
+
+def _history(tz, end):
+    try:
+        with _histories_lock:
+            history = _histories.get(tz)
+    except TypeError:
+        # Not all timezones can be weakly referenced, so those aren't cached
+        return _History(tz, end)
+
+    if history is None or (history.end is not None and history.end < end):
+        history = _History(tz, end)
+        with _histories_lock:
+            _histories[tz] = history
+    return history
+
+
+class TransitionTable:
+    """The transitions of a timezone between two years, in compact read-only arrays.
+
+    transitions holds the UTC times of the transitions, in seconds since the
+    epoch. utcoffsets and dst hold the UTC offset and the DST offset, in
+    seconds, and abbreviation_indices the index in abbreviations of the
+    abbreviation, of the time before the first transition, and after each
+    transition. They are all read-only memoryviews.
+
+    start and end are the first and last times the table covers, or None if
+    the table is correct for all times before or after its transitions."""
+
+    __slots__ = ("abbreviation_indices", "abbreviations", "dst", "end", "start", "transitions", "utcoffsets")
+
+    def __init__(self, transitions, utcoffsets, dst, abbreviation_indices, abbreviations, start=None, end=None):
+        if not len(utcoffsets) == len(dst) == len(abbreviation_indices) == len(transitions) + 1:
+            raise ValueError("There must be one more offset than there are transitions")
+        self.transitions = memoryview(array("q", transitions)).toreadonly()
+        self.utcoffsets = memoryview(array("i", utcoffsets)).toreadonly()
+        self.dst = memoryview(array("i", dst)).toreadonly()
+        self.abbreviation_indices = memoryview(array("H", abbreviation_indices)).toreadonly()
+        self.abbreviations = tuple(abbreviations)
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return len(self.transitions)
+
+    def __iter__(self):
+        """Yields (transition, utcoffset, dst, abbreviation index) for each transition."""
+        return zip(self.transitions, self.utcoffsets[1:], self.dst[1:], self.abbreviation_indices[1:])
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {len(self)} transitions from {self.start} to {self.end}>"
+
+    def index_at(self, epoch_seconds):
+        """The index in utcoffsets, dst and abbreviation_indices for the UTC time."""
+        if (self.start is not None and epoch_seconds < self.start) or (
+            self.end is not None and epoch_seconds > self.end
+        ):
+            raise ValueError(f"{epoch_seconds} is outside of the table, which goes from {self.start} to {self.end}")
+        return bisect.bisect_right(self.transitions, epoch_seconds)
+
+    def offset_at(self, epoch_seconds):
+        """The UTC offset, in seconds, at a UTC time in seconds since the epoch."""
+        return self.utcoffsets[self.index_at(epoch_seconds)]
+
+    def interval_at(self, epoch_seconds):
+        """Returns (start, end, utcoffset) for the interval between two transitions with the UTC time.
+
+        The offset is used from start, and until but not including end. start
+        and end are None if the offset is used forever before or after."""
+        index = self.index_at(epoch_seconds)
+        if index:
+            start = self.transitions[index - 1]
+        else:
+            start = self.start
+        if index < len(self.transitions):
+            end = self.transitions[index]
+        else:
+            end = None if self.end is None else self.end + 1
+        return start, end, self.utcoffsets[index]
+
+    def dst_at(self, epoch_seconds):
+        """The DST offset, in seconds, at a UTC time in seconds since the epoch."""
+        return self.dst[self.index_at(epoch_seconds)]
+
+    def abbreviation_at(self, epoch_seconds):
+        """The timezone abbreviation, like "CET", at a UTC time in seconds since the epoch."""
+        return self.abbreviations[self.abbreviation_indices[self.index_at(epoch_seconds)]]
+
+
+def transition_table(tz=None, start_year=None, end_year=None):
+    """Returns a TransitionTable of the transitions of tz from start_year to the end of end_year.
+
+    tz defaults to get_localzone(). If start_year is None, the table has all
+    transitions from the first one in the timezone data. If end_year is None,
+    the transitions are calculated until the end of the year 2100. If there
+    are no rules for the times after the last transition, the table has no
+    end either way."""
+    if tz is None:
+        from tzlocal import get_localzone
+
+        tz = get_localzone()
+
+    if end_year is None:
+        end_year = max(DEFAULT_END_YEAR, start_year or DEFAULT_END_YEAR)
+    if start_year is not None and start_year > end_year:
+        raise ValueError("start_year must not be after end_year")
+    for year in (start_year, end_year):
+        if year is not None and not MIN_YEAR <= year <= MAX_YEAR:
+            raise ValueError(f"The years must be between {MIN_YEAR} and {MAX_YEAR}")
+
+    start = None if start_year is None else _year_start(start_year)
+    end = _year_start(end_year + 1) - 1
+    history = _history(tz, end)
+    if history.end is None:
+        end = None
+
+    first = 0 if start is None else bisect.bisect_right(history.transitions, start)
+    last = len(history.transitions) if end is None else bisect.bisect_right(history.transitions, end)
+    infos = history.infos[first : last + 1]
+
+    abbreviations = list(dict.fromkeys(name for _, _, name in infos))
+    numbers = {name: number for number, name in enumerate(abbreviations)}
+    return TransitionTable(
+        history.transitions[first:last],
+        [utcoffset for utcoffset, _, _ in infos],
+        [dst for _, dst, _ in infos],
+        [numbers[name] for _, _, name in infos],
+        abbreviations,
+        start,
+        end,
+    )
+
+
+class YearCache:
+    """Looks up the UTC offsets of a timezone, with the transitions calculated one year at a time.
+
+    The transitions in the timezone data are looked up in a TransitionTable.
+    After the last of them, and at any time for a PosixZone, the transitions
+    come from the rules of the timezone. They are calculated for a whole year
+    the first time a time in that year is looked up, and kept in a bucket for
+    the year, so looking up another time in that year is a dictionary lookup
+    and a binary search. The maxsize most recently used years are kept.
+
+    The buckets are average Gregorian years long, 365.2425 days, counted from
+    the epoch, so that finding the bucket of a time is a division, not a date
+    calculation."""
+
+    def __init__(self, tz, maxsize=YEAR_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.tz = tz
+        self.maxsize = maxsize
+        # The year buckets: number -> (start, end, transitions, utcoffsets), with
+        # the offset at the start of the bucket, and after each transition.
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._last = (0, 0, (), ())
+
+        data = tzif.zone_data(tz)
+        self._rules = None
+        if data is not None:
+            # The table has the transitions in the data, until the end of the year of the last one
+            end_year = _year(data.transitions[-1]) if len(data.transitions) else None
+            if data.footer is not None and "," in data.footer:
+                self._rules = posix.parse(data.footer)
+        elif tz.utcoffset(None) is not None:
+            # A fixed offset, the table has it for all times
+            end_year = DEFAULT_END_YEAR
+        elif isinstance(tz, posix.PosixZone):
+            # The rules are used for all times
+            self._rules = tz
+            end_year = None
+        else:
+            # Some other tzinfo, which is probed for the default table, and one year at a time after that
+            end_year = DEFAULT_END_YEAR
+        self._table = None if end_year is None else transition_table(tz, end_year=end_year)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {len(self)} of {self.maxsize} years of {self.tz!s}>"
+
+    def _calculate(self, number):
+        start = number * _BUCKET_SECONDS
+        end = start + _BUCKET_SECONDS
+        if self._rules is not None:
+            transitions = _rule_transitions(self._rules, start, end - 1)
+        else:
+            transitions = utils._probe(self.tz, start, end - 1)
+        utcoffsets = [utils._utcoffset(self.tz, timestamp) for timestamp in [start, *transitions]]
+        return start, end, tuple(transitions), tuple(utcoffsets)
+
+    def _bucket(self, epoch_seconds):
+        number = int(epoch_seconds // _BUCKET_SECONDS)
+        if not _FIRST_BUCKET <= number <= _LAST_BUCKET:
+            raise ValueError(f"{epoch_seconds} is outside of the years {MIN_YEAR} to {MAX_YEAR}")
+        bucket = self._buckets.get(number)
+        if bucket is not None:
+            try:
+                self._buckets.move_to_end(number)
+            except KeyError:
+                # Another thread removed it just now, it is added back below
+                bucket = None
+        if bucket is None:
+            bucket = self._calculate(number)
+            with self._lock:
+                self._buckets[number] = bucket
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+        self._last = bucket
+        return bucket
+
+    def interval_at(self, epoch_seconds):
+        """Returns (start, end, utcoffset) for the interval with the same offset as the UTC time.
+
+        Like TransitionTable.interval_at(), except that intervals that come
+        from the rules also end where the year buckets end, and are never
+        None."""
+        table = self._table
+        if table is not None and (table.end is None or epoch_seconds <= table.end):
+            return table.interval_at(epoch_seconds)
+
+        start, end, transitions, utcoffsets = self._last
+        if not start <= epoch_seconds < end:
+            start, end, transitions, utcoffsets = self._bucket(epoch_seconds)
+        index = bisect.bisect_right(transitions, epoch_seconds)
+        return (
+            transitions[index - 1] if index else start,
+            transitions[index] if index < len(transitions) else end,
+            utcoffsets[index],
+        )
+
+    def offset_at(self, epoch_seconds):
+        """The UTC offset, in seconds, at a UTC time in seconds since the epoch."""
+        return self.interval_at(epoch_seconds)[2]
+
+
+def year_cache(tz=None):
+    """Returns the shared YearCache of tz, which defaults to get_localzone()."""
+    if tz is None:
+        from tzlocal import get_localzone
+
+        tz = get_localzone()
+
+    try:
+        with _year_caches_lock:
+            cache = _year_caches.get(tz)
+    except TypeError:
+        # Not all timezones can be weakly referenced, so those aren't shared
+        return YearCache(tz)
+
+    if cache is None:
+        cache = YearCache(tz)
+        with _year_caches_lock:
+            cache = _year_caches.setdefault(tz, cache)
+    return cache
+
+
+def _after_fork_in_child():
+    global _histories_lock
+    global _year_caches_lock
+    # Any other thread that held the locks doesn't exist in the child
+    _histories_lock = threading.Lock()
+    _year_caches_lock = threading.Lock()
+    for cache in list(_year_caches.values()):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
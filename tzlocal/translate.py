@@ -0,0 +1,123 @@
+"""Translating timezone names between Windows and zoneinfo, many at a time.
+
+win_to_tz() and tz_to_win() take an iterable of names, and return a list
+of the translated names, with None for the names that can't be translated.
+NumPy arrays, and anything else with an __array__() method, like pandas
+Series, give a NumPy object array of the same shape.
+
+The names are looked up in the index of the Windows mappings, without
+regard to case. Windows names can be given without the " Standard Time"
+suffix, or as the name of the daylight saving time, like "Pacific Daylight
+Time". Old zoneinfo names, like Europe/Kiev, are translated like their
+current name, and the other way around. Each name is only looked up once,
+including the names that are not found.
+"""
+
+import functools
+
+from tzlocal import windows_index
+
+_STANDARD = " Standard Time"
+_DAYLIGHT = " Daylight Time"
+
+
+@functools.cache
+def _alias_tables():
+    """Returns the canonical names of all known zoneinfo names, and the names of each canonical name.
+
+    The first is keyed on the lower case name, and has the correctly spelled
+    name too: lower case name -> (name, canonical name)."""
+    from tzlocal.tz_aliases import aliases
+
+    names = {}
+    groups = {}
+    for name, canonical in aliases.items():
+        names[name.lower()] = (name, canonical)
+        names.setdefault(canonical.lower(), (canonical, canonical))
+        groups.setdefault(canonical, [canonical]).append(name)
+    return names, groups
+
+
+def _clean(name):
+    if not isinstance(name, str):
+        return ""
+    # The registry can have NUL bytes at the end of names
+    return name.split("\x00", 1)[0].strip()
+
+
+@functools.lru_cache(maxsize=4096)
+def win_to_tz_name(name, canonical=False):
+    """Returns the zoneinfo name of a Windows timezone name, or None.
+
+    If canonical is True, the current name of the zone is returned, and not
+    the name in the Windows mappings, which can be an old one, like
+    Asia/Calcutta instead of Asia/Kolkata."""
+    name = _clean(name)
+    if not name:
+        return None
+    index = windows_index.get_index()
+    candidates = [name, name + _STANDARD]
+    if name.lower().endswith(_DAYLIGHT.lower()):
+        candidates.append(name[: -len(_DAYLIGHT)] + _STANDARD)
+    for candidate in candidates:
+        zone = index.win_to_tz(candidate, ignore_case=True)
+        if zone is not None:
+            if canonical:
+                names, _ = _alias_tables()
+                return names.get(zone.lower(), (zone, zone))[1]
+            return zone
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def tz_to_win_name(name):
+    """Returns the Windows timezone name of a zoneinfo name, or None."""
+    name = _clean(name)
+    if not name:
+        return None
+    index = windows_index.get_index()
+    win = index.tz_to_win(name, ignore_case=True)
+    if win is not None:
+        return win
+
+    # Try the other names of the same zone
+    names, groups = _alias_tables()
+    spelling, canonical = names.get(name.lower(), (name, name))
+    for alias in groups.get(canonical, ()):
+        if alias != spelling:
+            win = index.tz_to_win(alias)
+            if win is not None:
+                return win
+    return None
+
+
+def _translate(names, translate):
+    if isinstance(names, (str, bytes)):
+        raise TypeError("Expected an iterable of names, use win_to_tz_name() or tz_to_win_name() for one name")
+    array = None
+    if hasattr(names, "__array__"):
+        import numpy as np
+
+        array = np.asarray(names)
+        names = array.ravel().tolist()
+
+    # Most names come many times, so look each up once, without the overhead of the LRU cache
+    translated = {}
+    results = [
+        translated[name] if name in translated else translated.setdefault(name, translate(name)) for name in names
+    ]
+    if array is None:
+        return results
+    result = np.empty(len(results), dtype=object)
+    result[:] = results
+    return result.reshape(array.shape)
+
+
+def win_to_tz(names, canonical=False):
+    """Returns the zoneinfo names of the Windows timezone names, see win_to_tz_name()."""
+    return _translate(names, lambda name: win_to_tz_name(name, canonical))
+
+
+def tz_to_win(names):
+    """Returns the Windows timezone names of the zoneinfo names, see tz_to_win_name()."""
+    return _translate(names, tz_to_win_name)
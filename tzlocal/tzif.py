@@ -0,0 +1,151 @@
+"""Reading the TZif files that zoneinfo timezones are loaded from.
+
+The format is described in RFC 8536. This reads the 64-bit data of version 2
+and later files, and the 32-bit data of version 1 files.
+"""
+
+import os
+import posixpath
+import struct
+import zoneinfo
+from typing import NamedTuple
+
+from tzlocal import utils
+
+_header = struct.Struct(">4sc15x6l")
+_ttinfo = struct.Struct(">lBB")
+
+
+class TZifData(NamedTuple):
+    """The contents of a TZif file.
+
+    transitions are the UTC times of the transitions, in seconds since the
+    epoch, and indices are the local time type each transition changes to.
+    The local time types are described by utcoffsets (in seconds), isdst and
+    abbreviations. footer is the POSIX TZ string for the times after the last
+    transition, or None."""
+
+    transitions: tuple
+    indices: tuple
+    utcoffsets: tuple
+    isdst: tuple
+    abbreviations: tuple
+    footer: str | None
+
+    def type_before(self):
+        """The local time type used before the first transition.
+
+        This is the first standard time type, like zoneinfo does."""
+        for index, isdst in enumerate(self.isdst):
+            if not isdst:
+                return index
+        return self.indices[0] if self.indices else 0
+
+
+class _Layout(NamedTuple):
+    """Where the parts of the data used from a TZif file are, and how many there are."""
+
+    time_size: int
+    timecnt: int
+    typecnt: int
+    charcnt: int
+    transitions: int
+    indices: int
+    ttinfos: int
+    chars: int
+    #: Where the footer is, or None for version 1 files, which have none
+    footer: int | None
+
+
+def _read_layout(data):
+    """Finds the 64-bit data of version 2 and later files, or the 32-bit data of version 1 files."""
+    magic, version, isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = _header.unpack_from(data)
+    if magic != b"TZif":
+        raise ValueError("Not a TZif file")
+    start = _header.size
+    time_size = 4
+    if version != b"\x00":
+        # Skip the 32-bit data and use the 64-bit data after it
+        start += timecnt * 5 + typecnt * 6 + charcnt + leapcnt * 8 + isstdcnt + isutcnt
+        magic, version, isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = _header.unpack_from(data, start)
+        if magic != b"TZif":
+            raise ValueError("Not a TZif file")
+        start += _header.size
+        time_size = 8
+
+    indices = start + timecnt * time_size
+    ttinfos = indices + timecnt
+    chars = ttinfos + typecnt * _ttinfo.size
+    end = chars + charcnt + leapcnt * (time_size + 4) + isstdcnt + isutcnt
+    return _Layout(
+        time_size, timecnt, typecnt, charcnt, start, indices, ttinfos, chars, end if time_size == 8 else None
+    )
+
+
+def _read_types(data, layout):
+    """Returns the utcoffsets, isdst and abbreviations of the local time types."""
+    ttinfos = _ttinfo.iter_unpack(memoryview(data)[layout.ttinfos : layout.chars])
+    utcoffsets, isdst, indices = zip(*ttinfos) if layout.typecnt else ((), (), ())
+    chars = bytes(data[layout.chars : layout.chars + layout.charcnt])
+    names = {index: chars[index : chars.index(b"\x00", index)].decode("ascii") for index in set(indices)}
+    return utcoffsets, tuple(map(bool, isdst)), tuple(names[index] for index in indices)
+
+
+def _read_footer(data, layout):
+    """Returns the POSIX TZ string at the end of the file, or None."""
+    start = layout.footer
+    if start is None or bytes(data[start : start + 1]) != b"\n":
+        return None
+    return bytes(data[start + 1 : data.find(b"\n", start + 1)]).decode("ascii") or None
+
+
+def parse(data):
+    """Parses the bytes of a TZif file, and returns a TZifData."""
+    layout = _read_layout(data)
+    time_format = "q" if layout.time_size == 8 else "l"
+    return TZifData(
+        struct.unpack_from(f">{layout.timecnt}{time_format}", data, layout.transitions),
+        struct.unpack_from(f">{layout.timecnt}B", data, layout.indices),
+        *_read_types(data, layout),
+        _read_footer(data, layout),
+    )
+
+
+def _read_zone_file(key):
+    if os.path.isabs(key) or posixpath.normpath(key) != key:
+        return None
+    for tzpath in zoneinfo.TZPATH:
+        try:
+            with open(os.path.join(tzpath, *key.split("/")), "rb") as tzfile:
+                return tzfile.read()
+        except OSError:
+            continue
+
+    # zoneinfo falls back to the tzdata package, so we do too
+    import importlib.resources
+
+    package, _, resource = ("tzdata.zoneinfo/" + key).rpartition("/")
+    try:
+        return importlib.resources.files(package.replace("/", ".")).joinpath(resource).read_bytes()
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def zone_data(tz):
+    """Returns the TZifData of a zoneinfo timezone, or None if it can't be found.
+
+    Timezones created by tzlocal from files, like /etc/localtime, are read
+    from the data they were created from, other ZoneInfo objects from the
+    zoneinfo file with the same key. MappedZone timezones are supported too."""
+    from tzlocal.mapped import MappedZone
+
+    if isinstance(tz, MappedZone):
+        return parse(tz._data)
+    if not isinstance(tz, zoneinfo.ZoneInfo):
+        return None
+    data = utils._tz_data.get(tz)
+    if data is None and tz.key:
+        data = _read_zone_file(tz.key)
+    if data is None:
+        return None
+    return parse(data)
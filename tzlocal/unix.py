@@ -1,183 +1,464 @@
+import collections
 import logging
 import os
 import re
+import stat
+import threading
+import time
 import warnings
 import zoneinfo
-from datetime import timezone
+from datetime import timezone, tzinfo
 
 from tzlocal import utils
 
 _cache_tz = None
 _cache_tz_name = None
+# Held while the cache is filled or changed, so only one thread looks up the zone
+_cache_lock = threading.RLock()
+_cache_fingerprint = None
+_revalidate_interval = None
+_revalidated_at = None
+_revalidate_once = False
+_fork_policy = "inherit"
+_fork_warm = False
+_fork_fingerprint = None
+_watcher = None
+_watcher_args = None
+# The directory of the disk cache, or None if it's off
+_disk_cache_dir = None
+
+# The configuration files that _get_localzone_name() and _get_localzone() read
+_config_files = (
+    "etc/timezone",
+    "var/db/zoneinfo",
+    "etc/sysconfig/clock",
+    "etc/conf.d/clock",
+    "etc/localtime",
+    "usr/local/etc/localtime",
+)
 
 log = logging.getLogger("tzlocal")
 
 
-def _get_localzone_name(_root="/"):
+class TraceStep(collections.namedtuple("TraceStep", "step hit duration_ns detail syscalls", defaults=(None, 0))):
+    """One step of looking up the timezone, see trace_localzone().
+
+    step is what was done, like "env" or "etc/timezone", hit is if the step
+    found a timezone, duration_ns how long it took, in nanoseconds, detail
+    what was found, if anything, and syscalls how many file system calls it
+    made."""
+
+    __slots__ = ()
+
+
+class ResolutionTrace:
+    """A record of how the local timezone was looked up, see trace_localzone()."""
+
+    def __init__(self, root="/"):
+        self.root = root
+        self.steps = []
+        self.name = None
+        self.tz = None
+        self.error = None
+        #: How many file system calls were made, see _Probe
+        self.syscalls = 0
+        self._step_syscalls = 0
+
+    def add(self, step, hit, start_ns, detail=None):
+        """Records a step that started at start_ns, from time.perf_counter_ns()"""
+        syscalls = self.syscalls - self._step_syscalls
+        self._step_syscalls = self.syscalls
+        self.steps.append(TraceStep(step, hit, time.perf_counter_ns() - start_ns, detail, syscalls))
+
+    @property
+    def total_ns(self):
+        return sum(step.duration_ns for step in self.steps)
+
+    def as_dict(self):
+        """Returns the trace as a dictionary of simple types, for logging or metrics."""
+        return {
+            "root": self.root,
+            "name": self.name,
+            "tz": None if self.tz is None else str(self.tz),
+            "error": None if self.error is None else repr(self.error),
+            "total_ns": self.total_ns,
+            "syscalls": self.syscalls,
+            "steps": [step._asdict() for step in self.steps],
+        }
+
+    def __repr__(self):
+        return f"<ResolutionTrace {self.root!r}: {self.tz!s} in {len(self.steps)} steps, {self.total_ns} ns>"
+
+
+# The entries in etc/ that have timezone configuration in them
+_etc_names = {"timezone", "localtime", "sysconfig", "conf.d"}
+
+
+class _Probe:
+    """The timezone configuration files of a root directory, looked at once.
+
+    This lists etc/ with one scandir() call, and doesn't look for files that
+    that listing shows can't exist. What it finds is kept, so that finding
+    the name and the timezone don't look at the same files twice.
+
+    It counts the file system calls it makes: each scandir(), stat(),
+    lstat(), readlink() and opened file counts as one."""
+
+    def __init__(self, root="/", trace=None):
+        self.root = root
+        self.syscalls = 0
+        self._trace = trace
+        self._etc = False
+        self._localtime_target = False
+
+    def _count(self):
+        self.syscalls += 1
+        if self._trace is not None:
+            self._trace.syscalls += 1
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def etc(self):
+        """The entries in etc/ that have timezone configuration, by name.
+
+        None if etc/ exists but can't be listed, like when it can be
+        traversed but not read."""
+        if self._etc is False:
+            etc = {}
+            self._count()
+            try:
+                with os.scandir(self.path("etc")) as entries:
+                    for entry in entries:
+                        if entry.name in _etc_names:
+                            etc[entry.name] = entry
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+            except OSError:
+                etc = None
+            self._etc = etc
+        return self._etc
+
+    def may_exist(self, name):
+        """False if the listing of etc/ shows that the file can't exist."""
+        directory, _, rest = name.partition("/")
+        if directory != "etc":
+            return True
+        entryname, _, rest = rest.partition("/")
+        etc = self.etc()
+        if etc is None:
+            # Without a listing, the file has to be looked for
+            return True
+        entry = etc.get(entryname)
+        if entry is None:
+            return False
+        return not rest or entry.is_dir()
+
+    def exists(self, name):
+        if not self.may_exist(name):
+            return False
+        self._count()
+        return os.path.exists(self.path(name))
+
+    def read(self, name, reader):
+        """Calls reader with the path of the file, if the file may exist."""
+        if not self.may_exist(name):
+            return None
+        self._count()
+        return reader(self.path(name))
+
+    def localtime_target(self):
+        """The file etc/localtime is a symlink to, or None if it isn't a symlink.
+
+        Chains of symlinks are followed, but not symlinked directories."""
+        if self._localtime_target is False:
+            self._localtime_target = None
+            path = self.path("etc/localtime")
+            etc = self.etc()
+            if etc is None:
+                self._count()
+                is_symlink = os.path.islink(path)
+            else:
+                entry = etc.get("localtime")
+                is_symlink = entry is not None and entry.is_symlink()
+            if is_symlink:
+                # Like the kernel, give up after 40 symlinks
+                for _ in range(40):
+                    try:
+                        self._count()
+                        path = os.path.normpath(os.path.join(os.path.dirname(path), os.readlink(path)))
+                        self._count()
+                        if not stat.S_ISLNK(os.lstat(path).st_mode):
+                            self._localtime_target = path
+                            break
+                    except OSError:
+                        # A broken symlink
+                        break
+        return self._localtime_target
+
+
+def _get_localzone_name(_root="/", _trace=None, _probe=None):
     """Tries to find the local timezone configuration.
 
     This method finds the timezone name, if it can, or it returns None.
 
     The parameter _root makes the function look for files like /etc/localtime
     beneath the _root directory. This is primarily used by the tests.
-    In normal usage you call the function without parameters."""
+    In normal usage you call the function without parameters.
+
+    If _trace is a ResolutionTrace, every step is recorded in it. _probe is
+    the _Probe of _root, if there already is one."""
 
     # First try the ENV setting.
+    if _trace is not None:
+        start = time.perf_counter_ns()
     tzenv = utils._tz_name_from_env()
+    if _trace is not None:
+        _trace.add("env", bool(tzenv), start, tzenv)
     if tzenv:
         return tzenv
 
     # Are we under Termux on Android?
-    if os.path.exists(os.path.join(_root, "system/bin/getprop")):
+    if _trace is not None:
+        start = time.perf_counter_ns()
+    if _probe is None:
+        _probe = _Probe(_root, _trace)
+    if _probe.exists("system/bin/getprop"):
         log.debug("This looks like Termux")
 
         import subprocess
 
         try:
             androidtz = subprocess.check_output(["getprop", "persist.sys.timezone"]).strip().decode()
+            if _trace is not None:
+                _trace.add("termux getprop", True, start, androidtz)
             return androidtz
         except (OSError, subprocess.CalledProcessError):
             # proot environment or failed to getprop
             log.debug("It's not termux?")
-            pass
+    if _trace is not None:
+        _trace.add("termux getprop", False, start)
+
+    found_configs = _read_configs(_root, _trace, _probe)
+    if len(found_configs) > 0:
+        # We found exactly one config! Use it.
+        return list(_resolve_configs(found_configs, _root, _trace).values())[0]
+
+
+def _read_timezone_file(tzpath):
+    """Reads a file with just the timezone name in it, like /etc/timezone.
+
+    Returns the name, or None."""
+    try:
+        with open(tzpath, encoding="ascii") as tzfile:
+            data = tzfile.read()
+    except (OSError, UnicodeDecodeError):
+        # File doesn't exist or is a directory, or it's a binary file.
+        return None
+    log.debug("%s found, contents:\n %s", tzpath, data)
+
+    tzname = None
+    for etctz in data.strip("/ \t\r\n").splitlines():
+        # Get rid of host definitions and comments:
+        if " " in etctz:
+            etctz, _ = etctz.split(" ", 1)
+        if "#" in etctz:
+            etctz, _ = etctz.split("#", 1)
+        if not etctz:
+            continue
+
+        tzname = etctz.replace(" ", "_")
+    return tzname
+
+
+# CentOS has a ZONE setting in /etc/sysconfig/clock,
+# OpenSUSE has a TIMEZONE setting in /etc/sysconfig/clock and
+# Gentoo has a TIMEZONE setting in /etc/conf.d/clock
+_zone_re = re.compile(r"\s*ZONE\s*=\s*\"")
+_timezone_re = re.compile(r"\s*TIMEZONE\s*=\s*\"")
+_end_re = re.compile('"')
+
+
+def _read_clock_file(tzpath):
+    """Reads a file with a ZONE or TIMEZONE setting, like /etc/sysconfig/clock.
+
+    Returns the name, or None."""
+    try:
+        with open(tzpath, "rt") as tzfile:
+            data = tzfile.readlines()
+    except (OSError, UnicodeDecodeError):
+        # UnicodeDecode handles when clock is symlink to /etc/localtime
+        return None
+    log.debug("%s found, contents:\n %s", tzpath, data)
+
+    tzname = None
+    for line in data:
+        # Look for the ZONE= setting.
+        match = _zone_re.match(line)
+        if match is None:
+            # No ZONE= setting. Look for the TIMEZONE= setting.
+            match = _timezone_re.match(line)
+        if match is not None:
+            # Some setting existed
+            tzline = line[match.end() :]
+            end_match = _end_re.search(tzline)
+            if end_match is None:
+                # Syntax error. Ignore this line.
+                warnings.warn(f"Syntax error in {tzpath}. Ignoring line: {line}")
+                continue
+            etctz = tzline[: end_match.start()]
+
+            # We found a timezone
+            tzname = etctz.replace(" ", "_")
+    return tzname
+
+
+def _read_configs(_root="/", _trace=None, _probe=None):
+    """Reads the configuration files that contain the timezone name.
 
-    # Now look for distribution specific configuration files
+    Returns a dict with where the names were found as keys and the names
+    as values."""
+    if _probe is None:
+        _probe = _Probe(_root, _trace)
+
+    # Look for distribution specific configuration files
     # that contain the timezone name.
 
     # Stick all of them in a dict, to compare later.
     found_configs = {}
 
-    for configfile in ("etc/timezone", "var/db/zoneinfo"):
+    for configfile, reader in (
+        ("etc/timezone", _read_timezone_file),
+        ("var/db/zoneinfo", _read_timezone_file),
+        ("etc/sysconfig/clock", _read_clock_file),
+        ("etc/conf.d/clock", _read_clock_file),
+    ):
+        if _trace is not None:
+            start = time.perf_counter_ns()
         tzpath = os.path.join(_root, configfile)
-        try:
-            with open(tzpath, encoding="ascii") as tzfile:
-                data = tzfile.read()
-                log.debug(f"{tzpath} found, contents:\n {data}")
-
-                etctz = data.strip("/ \t\r\n")
-                if not etctz:
-                    # Empty file, skip
-                    continue
-                for etctz in etctz.splitlines():
-                    # Get rid of host definitions and comments:
-                    if " " in etctz:
-                        etctz, _ = etctz.split(" ", 1)
-                    if "#" in etctz:
-                        etctz, _ = etctz.split("#", 1)
-                    if not etctz:
-                        continue
-
-                    found_configs[tzpath] = etctz.replace(" ", "_")
-
-        except (OSError, UnicodeDecodeError):
-            # File doesn't exist or is a directory, or it's a binary file.
-            continue
-
-    # CentOS has a ZONE setting in /etc/sysconfig/clock,
-    # OpenSUSE has a TIMEZONE setting in /etc/sysconfig/clock and
-    # Gentoo has a TIMEZONE setting in /etc/conf.d/clock
-    # We look through these files for a timezone:
-
-    zone_re = re.compile(r"\s*ZONE\s*=\s*\"")
-    timezone_re = re.compile(r"\s*TIMEZONE\s*=\s*\"")
-    end_re = re.compile('"')
-
-    for filename in ("etc/sysconfig/clock", "etc/conf.d/clock"):
-        tzpath = os.path.join(_root, filename)
-        try:
-            with open(tzpath, "rt") as tzfile:
-                data = tzfile.readlines()
-                log.debug(f"{tzpath} found, contents:\n {data}")
-
-            for line in data:
-                # Look for the ZONE= setting.
-                match = zone_re.match(line)
-                if match is None:
-                    # No ZONE= setting. Look for the TIMEZONE= setting.
-                    match = timezone_re.match(line)
-                if match is not None:
-                    # Some setting existed
-                    tzline = line[match.end() :]
-                    end_match = end_re.search(tzline)
-                    if end_match is None:
-                        # Syntax error. Ignore this line.
-                        warnings.warn(f"Syntax error in {tzpath}. Ignoring line: {line}")
-                        continue
-                    etctz = tzline[:end_match.start()]
-
-                    # We found a timezone
-                    found_configs[tzpath] = etctz.replace(" ", "_")
-
-        except (OSError, UnicodeDecodeError):
-            # UnicodeDecode handles when clock is symlink to /etc/localtime
-            continue
+        tzname = _probe.read(configfile, reader)
+        if tzname:
+            found_configs[tzpath] = tzname
+        if _trace is not None:
+            _trace.add(configfile, bool(tzname), start, tzname)
 
     # systemd distributions use symlinks that include the zone name,
     # see manpage of localtime(5) and timedatectl(1)
+    if _trace is not None:
+        start = time.perf_counter_ns()
     tzpath = os.path.join(_root, "etc/localtime")
-    if os.path.exists(tzpath) and os.path.islink(tzpath):
-        log.debug(f"{tzpath} found")
-        etctz = os.path.realpath(tzpath)
-        start = etctz.find("/") + 1
-        while start != 0:
-            etctz = etctz[start:]
-            try:
-                zoneinfo.ZoneInfo(etctz)
-                tzinfo = f"{tzpath} is a symlink to"
-                found_configs[tzinfo] = etctz.replace(" ", "_")
-                # Only need first valid relative path in simlink.
-                break
-            except zoneinfo.ZoneInfoNotFoundError:
-                pass
-            start = etctz.find("/") + 1
-
-    if len(found_configs) > 0:
-        log.debug(f"{len(found_configs)} found:\n {found_configs}")
-
-        # We found some explicit config of some sort!
-        if len(found_configs) > 1:
-            # Uh-oh, multiple configs. See if they match:
+    target = _probe.localtime_target()
+    tzname = None
+    if target is not None:
+        from tzlocal import zoneindex
+
+        log.debug("%s found", tzpath)
+        tzname = zoneindex.zone_name_from_path(target)
+    if tzname:
+        found_configs[f"{tzpath} is a symlink to"] = tzname
+    if _trace is not None:
+        _trace.add("localtime symlink", bool(tzname), start, tzname)
+
+    return found_configs
+
+
+def _resolve_configs(found_configs, _root="/", _trace=None):
+    """Checks that the configs found by _read_configs() agree.
+
+    Returns the configs that can be trusted, and raises ZoneInfoNotFoundError
+    if they conflict."""
+    log.debug("%s found:\n %s", len(found_configs), found_configs)
+
+    # We found some explicit config of some sort!
+    if len(found_configs) > 1:
+        # Uh-oh, multiple configs. See if they match:
+        if _trace is not None:
+            start = time.perf_counter_ns()
+        unique_tzs = _get_unique_tzs(found_configs, _root)
+        if _trace is not None:
+            _trace.add("alias dedup", len(unique_tzs) == 1, start, ", ".join(sorted(unique_tzs)))
+
+        if len(unique_tzs) != 1 and "etc/timezone" in str(found_configs.keys()):
+            # For some reason some distros are removing support for /etc/timezone,
+            # which is bad, because that's the only place where the timezone is stated
+            # in plain text, and what's worse, they don't delete it. So we can't trust
+            # it now, so when we have conflicting configs, we just ignore it, with a warning.
+            log.warning(
+                "/etc/timezone is deprecated in some distros, and no longer reliable. "
+                "tzlocal is ignoring it, and you can likely delete it."
+            )
+            found_configs = {k: v for k, v in found_configs.items() if "etc/timezone" not in k}
+            if _trace is not None:
+                start = time.perf_counter_ns()
             unique_tzs = _get_unique_tzs(found_configs, _root)
+            if _trace is not None:
+                _trace.add("alias dedup", len(unique_tzs) == 1, start, ", ".join(sorted(unique_tzs)))
 
-            if len(unique_tzs) != 1 and "etc/timezone" in str(found_configs.keys()):
-                # For some reason some distros are removing support for /etc/timezone,
-                # which is bad, because that's the only place where the timezone is stated
-                # in plain text, and what's worse, they don't delete it. So we can't trust
-                # it now, so when we have conflicting configs, we just ignore it, with a warning.
-                log.warning(
-                    "/etc/timezone is deprecated in some distros, and no longer reliable. "
-                    "tzlocal is ignoring it, and you can likely delete it."
-                )
-                found_configs = {k: v for k, v in found_configs.items() if "etc/timezone" not in k}
-                unique_tzs = _get_unique_tzs(found_configs, _root)
-
-            if len(unique_tzs) != 1:
-                message = "Multiple conflicting time zone configurations found:\n"
-                for key, value in found_configs.items():
-                    message += f"{key}: {value}\n"
-                message += "Fix the configuration, or set the time zone in a TZ environment variable.\n"
-                raise zoneinfo.ZoneInfoNotFoundError(message)
+        if len(unique_tzs) != 1:
+            message = "Multiple conflicting time zone configurations found:\n"
+            for key, value in found_configs.items():
+                message += f"{key}: {value}\n"
+            message += "Fix the configuration, or set the time zone in a TZ environment variable.\n"
+            raise zoneinfo.ZoneInfoNotFoundError(message)
 
-        # We found exactly one config! Use it.
-        return list(found_configs.values())[0]
+    return found_configs
 
 
 def _get_unique_tzs(found_configs, _root):
-    unique_tzs = set()
+    """The canonical names of the configured timezones, so aliases count as the same timezone."""
+    from tzlocal.tz_aliases import aliases
+
+    unique_tzs = {aliases.get(tzname, tzname) for tzname in found_configs.values()}
+
     zoneinfopath = os.path.join(_root, "usr", "share", "zoneinfo")
-    directory_depth = len(zoneinfopath.split(os.path.sep))
+    if len(unique_tzs) > 1 and os.path.normpath(zoneinfopath) in map(os.path.normpath, zoneinfo.TZPATH):
+        # The zoneinfo tree may have links of its own that aren't in the tzdata database
+        from tzlocal import zoneindex
 
-    for tzname in found_configs.values():
-        # Look them up in /usr/share/zoneinfo, and find what they
-        # really point to:
-        path = os.path.realpath(os.path.join(zoneinfopath, *tzname.split("/")))
-        real_zone_name = "/".join(path.split(os.path.sep)[directory_depth:])
-        unique_tzs.add(real_zone_name)
+        index = zoneindex.get_index()
+        unique_tzs = {aliases.get(name, name) for name in map(index.canonical_name, unique_tzs)}
 
     return unique_tzs
 
 
-def _get_localzone(_root="/"):
+def _lookup_localzone_name(_root="/", _trace=None, _probe=None):
+    """Calls _get_localzone_name(), using the disk cache if it's on."""
+    directory = _disk_cache_dir
+    if directory is None or _root != "/" or _trace is not None:
+        return _get_localzone_name(_root, _trace, _probe)
+
+    from tzlocal import diskcache
+
+    # Take the fingerprint before looking up the name, so that a change made
+    # during the lookup makes the saved name stale, not wrong.
+    fingerprint = _fingerprint(_root)
+    found, tzname = diskcache.load(directory, fingerprint)
+    if not found:
+        tzname = _get_localzone_name(_root, _probe=_probe)
+        diskcache.store(directory, fingerprint, tzname)
+    return tzname
+
+
+def set_disk_cache(enabled=True, directory=None):
+    """Save the local timezone name on disk, for other processes to use.
+
+    Each process normally looks up the timezone by reading the configuration
+    files. With the disk cache on, the name is saved with a fingerprint of
+    the configuration files and the TZ environment variable, and processes
+    that find an unchanged fingerprint use the saved name. This is useful
+    for hosts that start many short-lived Python processes.
+
+    The directory defaults to $XDG_RUNTIME_DIR/tzlocal."""
+    global _disk_cache_dir
+    if enabled:
+        from tzlocal import diskcache
+
+        _disk_cache_dir = directory or diskcache.default_directory()
+    else:
+        _disk_cache_dir = None
+
+
+def _get_localzone(_root="/", _trace=None):
     """Creates a timezone object from the timezone name.
 
     If there is no timezone config, it will try to create a file from the
@@ -185,66 +466,377 @@ def _get_localzone(_root="/"):
 
     The parameter _root makes the function look for files like /etc/localtime
     beneath the _root directory. This is primarily used by the tests.
-    In normal usage you call the function without parameters."""
+    In normal usage you call the function without parameters.
+
+    If _trace is a ResolutionTrace, every step is recorded in it."""
 
     # First try the ENV setting.
+    if _trace is not None:
+        start = time.perf_counter_ns()
     tzenv = utils._tz_from_env()
     if tzenv:
+        if _trace is not None:
+            _trace.add("env", True, start, str(tzenv))
+            _trace.name = utils._tz_name_from_env()
         return tzenv
+    # If there is no TZ, _get_localzone_name() records the env step
 
-    tzname = _get_localzone_name(_root)
+    probe = _Probe(_root, _trace)
+    tzname = _lookup_localzone_name(_root, _trace, probe)
+    if _trace is not None:
+        _trace.name = tzname
     if tzname is None:
         # No explicit setting existed. Use localtime
         log.debug("No explicit setting existed. Use localtime")
-        for filename in ("etc/localtime", "usr/local/etc/localtime"):
-            tzpath = os.path.join(_root, filename)
-
-            if not os.path.exists(tzpath):
-                continue
-            with open(tzpath, "rb") as tzfile:
-                tz = zoneinfo.ZoneInfo.from_file(tzfile, key="local")
-                break
-        else:
+        if _trace is not None:
+            start = time.perf_counter_ns()
+        tzpath, tz = _read_localtime(_root, probe)
+        if _trace is not None:
+            _trace.add("localtime file", tz is not None, start, tzpath)
+        if tz is None:
             warnings.warn("Can not find any timezone configuration, defaulting to UTC.")
-            utcname = [x for x in zoneinfo.available_timezones() if "UTC" in x]
-            if utcname:
-                tz = zoneinfo.ZoneInfo(utcname[0])
-            else:
-                tz = timezone.utc
+            tz = _default_tz()
     else:
         tz = zoneinfo.ZoneInfo(tzname)
 
     if _root == "/":
         # We are using a file in etc to name the timezone.
         # Verify that the timezone specified there is actually used:
-        utils.assert_tz_offset(tz, error=False)
+        if _trace is not None:
+            start = time.perf_counter_ns()
+        checked = utils._check_tz_offset(tz)
+        if _trace is not None:
+            _trace.add("offset assertion", checked, start)
     return tz
 
 
+def trace_localzone(_root="/"):
+    """Looks up the local timezone, and records what was done and how long it took.
+
+    This doesn't use or change the cached localzone. Returns a ResolutionTrace,
+    with the name and timezone found, or the error if the lookup failed."""
+    trace = ResolutionTrace(_root)
+    try:
+        trace.tz = _get_localzone(_root, trace)
+    except (OSError, ValueError, zoneinfo.ZoneInfoNotFoundError) as e:
+        trace.error = e
+    return trace
+
+
+def _read_localtime(_root="/", _probe=None):
+    """Creates a timezone object from the localtime file.
+
+    Returns the path of the file and the timezone, or (None, None) if there
+    is no localtime file."""
+    if _probe is None:
+        _probe = _Probe(_root)
+    for filename in ("etc/localtime", "usr/local/etc/localtime"):
+        tzpath = _probe.path(filename)
+        try:
+            tz = _probe.read(filename, lambda path: utils._tz_from_file(path, key="local"))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if tz is not None:
+            return tzpath, tz
+    return None, None
+
+
+def _default_tz():
+    """The timezone to use when there is no configuration at all, UTC."""
+    from tzlocal import zoneindex
+
+    utcname = zoneindex.get_index().utc_name()
+    if utcname:
+        return zoneinfo.ZoneInfo(utcname)
+    return timezone.utc
+
+
+class RootZone(collections.namedtuple("RootZone", "root name tz source configs conflicts error")):
+    """The timezone configuration of a root directory, see resolve_roots().
+
+    root is the root directory, name the configured timezone name, or None
+    if no name is configured, and tz the timezone, or None if it could not be
+    found. source is where the timezone came from, or None if it defaulted to
+    UTC. configs has all the configurations that were found, where they were
+    found and the name, and conflicts the ones that conflict with the chosen
+    one. error is the error, if the timezone could not be found."""
+
+    __slots__ = ()
+
+
+def _resolve_root(root):
+    configs = {}
+    try:
+        probe = _Probe(root)
+        configs = _read_configs(root, _probe=probe)
+        try:
+            trusted = _resolve_configs(configs, root) if configs else {}
+        except zoneinfo.ZoneInfoNotFoundError as e:
+            return RootZone(root, None, None, None, configs, list(configs), e)
+
+        conflicts = [key for key in configs if key not in trusted]
+        if trusted:
+            source, name = next(iter(trusted.items()))
+            return RootZone(root, name, zoneinfo.ZoneInfo(name), source, configs, conflicts, None)
+
+        source, tz = _read_localtime(root, probe)
+        if tz is None:
+            tz = _default_tz()
+        return RootZone(root, None, tz, source, configs, conflicts, None)
+    except (OSError, ValueError, zoneinfo.ZoneInfoNotFoundError) as e:
+        return RootZone(root, None, None, None, configs, [], e)
+
+
+def resolve_roots(roots, max_workers=None):
+    """Finds the timezone configuration of many root directories in parallel.
+
+    This is meant for auditing container images and chroots. Each root is
+    looked up on a thread pool, just like the local timezone would be if that
+    directory was /, except that the TZ environment variable and Termux are
+    ignored, and no warnings are issued for missing configuration.
+
+    Yields a RootZone for each root, in the same order as the roots."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Don't queue up more than a few roots per worker, roots can be a long iterator.
+        pending = collections.deque()
+        for root in roots:
+            pending.append(executor.submit(_resolve_root, root))
+            if len(pending) >= max_workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _fingerprint(_root="/"):
+    """A cheap fingerprint of everything the local timezone is looked up from."""
+    return (os.environ.get("TZ"),) + tuple(
+        utils._file_fingerprint(os.path.join(_root, filename)) for filename in _config_files
+    )
+
+
+def _revalidate():
+    """Clears the cache if the configuration changed since it was filled."""
+    global _cache_fingerprint
+    global _revalidated_at
+    global _revalidate_interval
+    global _revalidate_once
+    now = time.monotonic()
+    with _cache_lock:
+        # The interval can be changed by other threads, so check it and the time together
+        interval, revalidated_at = _revalidate_interval, _revalidated_at
+        if interval is None or (revalidated_at is not None and now - revalidated_at < interval):
+            return
+
+        _revalidated_at = now
+        fingerprint = _fingerprint()
+        if fingerprint != _cache_fingerprint:
+            if _cache_fingerprint is not None:
+                log.debug("Timezone configuration changed, clearing the cache")
+            # Take the fingerprint before looking up the zone, so that a change
+            # made during the lookup is caught by the next revalidation.
+            _clear_cache()
+            _cache_fingerprint = fingerprint
+        if _revalidate_once:
+            # This was a single check after a fork
+            _revalidate_interval = None
+            _revalidate_once = False
+
+
+def _revalidation_due():
+    """Checks if the next call to get_localzone() will check the configuration."""
+    if _revalidate_interval is None:
+        return False
+    if not _cache_lock.acquire(blocking=False):
+        # Another thread is looking up the zone, or checking the configuration
+        return True
+    try:
+        interval, revalidated_at = _revalidate_interval, _revalidated_at
+    finally:
+        _cache_lock.release()
+    return interval is not None and (revalidated_at is None or time.monotonic() - revalidated_at >= interval)
+
+
+def set_revalidation_interval(interval):
+    """Make get_localzone() and get_localzone_name() check if the configuration has changed.
+
+    Instead of trusting the cached timezone forever, the configuration files
+    and the TZ environment variable are checked with a few stat() calls, at
+    most once every interval seconds, and the timezone is looked up again only
+    if they changed. An interval of 0 checks on every call, and None turns the
+    checking off, which is the default."""
+    global _revalidate_interval
+    global _revalidated_at
+    global _cache_fingerprint
+    global _revalidate_once
+    with _cache_lock:
+        _revalidate_interval = interval
+        _revalidated_at = None
+        _revalidate_once = False
+        _cache_fingerprint = None
+
+
 def get_localzone_name() -> str:
     """Get the computers configured local timezone name, if any."""
     global _cache_tz_name
-    if _cache_tz_name is None:
-        _cache_tz_name = _get_localzone_name()
+    if _revalidate_interval is not None:
+        _revalidate()
+    tzname = _cache_tz_name
+    if tzname is None:
+        with _cache_lock:
+            # Another thread may have looked it up while we waited for the lock
+            if _cache_tz_name is None:
+                _cache_tz_name = _lookup_localzone_name()
+            tzname = _cache_tz_name
 
-    return _cache_tz_name
+    return tzname
 
 
-def get_localzone() -> zoneinfo.ZoneInfo:
+def get_localzone() -> tzinfo:
     """Get the computers configured local timezone, if any."""
 
     global _cache_tz
-    if _cache_tz is None:
-        _cache_tz = _get_localzone()
+    if _revalidate_interval is not None:
+        _revalidate()
+    tz = _cache_tz
+    if tz is None:
+        with _cache_lock:
+            # Another thread may have looked it up while we waited for the lock
+            if _cache_tz is None:
+                _cache_tz = _get_localzone()
+            tz = _cache_tz
 
-    return _cache_tz
+    return tz
 
 
-def reload_localzone() -> zoneinfo.ZoneInfo:
+def reload_localzone() -> tzinfo:
     """Reload the cached localzone. You need to call this if the timezone has changed."""
     global _cache_tz_name
     global _cache_tz
-    _cache_tz_name = _get_localzone_name()
-    _cache_tz = _get_localzone()
+    from tzlocal import zoneindex
+
+    with _cache_lock:
+        # The zoneinfo tree may have changed too
+        zoneindex.clear_cache()
+        # Look up both before changing the cache, so the name and zone are
+        # replaced together, and nothing changes if the lookup fails.
+        tzname = _lookup_localzone_name()
+        tz = _get_localzone()
+        _cache_tz_name, _cache_tz = tzname, tz
+
+    return tz
+
+
+def _clear_cache():
+    global _cache_tz_name
+    global _cache_tz
+    from tzlocal import zoneindex
+
+    with _cache_lock:
+        _cache_tz_name = None
+        _cache_tz = None
+        zoneindex.clear_cache()
 
-    return _cache_tz
+
+def watch_localzone(poll_interval=5.0, _root="/"):
+    """Clear the cached localzone automatically when the timezone configuration changes.
+
+    This starts a background thread that watches the configuration files,
+    using inotify if available, otherwise checking them every poll_interval
+    seconds. The next call to get_localzone() after a change will look up the
+    timezone again."""
+    global _watcher
+    global _watcher_args
+    if _watcher is None or not _watcher.running:
+        from tzlocal import watch
+
+        paths = [os.path.join(_root, filename) for filename in _config_files]
+        _watcher = watch.watch(paths, _clear_cache, poll_interval=poll_interval)
+        _watcher_args = (poll_interval, _root)
+    return _watcher
+
+
+def unwatch_localzone():
+    """Stop watching the timezone configuration."""
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
+
+
+def set_fork_policy(policy="inherit", warm=False):
+    """Decide what happens to the cached localzone in forked child processes.
+
+    The policy can be:
+
+    "inherit": The child uses the cache of the parent. This is the default.
+    "revalidate": The child uses the cache of the parent, but the first time
+        it's used, checks that the configuration hasn't changed since the fork.
+    "reset": The child looks up the localzone again.
+
+    With warm=True, the parent fills the cache right before forking, so
+    that pre-fork servers look up the timezone once, instead of once in
+    every child process."""
+    global _fork_policy
+    global _fork_warm
+    if policy not in ("inherit", "revalidate", "reset"):
+        raise ValueError(f"Unknown fork policy: {policy}")
+    _fork_policy = policy
+    _fork_warm = warm
+
+
+def _before_fork():
+    global _fork_fingerprint
+    if _fork_warm:
+        try:
+            get_localzone()
+            get_localzone_name()
+        except (LookupError, OSError, ValueError) as e:
+            log.debug("Could not look up the localzone before forking: %s", e)
+    # Don't fork while another thread is changing the cache
+    _cache_lock.acquire()
+    if _fork_policy == "revalidate" and _revalidate_interval is None:
+        _fork_fingerprint = _fingerprint()
+
+
+def _after_fork_in_parent():
+    _cache_lock.release()
+
+
+def _after_fork_in_child():
+    global _cache_lock
+    global _cache_fingerprint
+    global _revalidate_interval
+    global _revalidated_at
+    global _revalidate_once
+    global _watcher
+    # Any other thread that held the lock doesn't exist in the child
+    _cache_lock = threading.RLock()
+
+    if _fork_policy == "reset":
+        _clear_cache()
+    elif _fork_policy == "revalidate":
+        if _revalidate_interval is None:
+            # Check once, against the configuration at the time of the fork
+            _revalidate_interval = 0
+            _revalidate_once = True
+            _cache_fingerprint = _fork_fingerprint
+        _revalidated_at = None
+
+    if _watcher is not None:
+        # The watching thread wasn't copied into the child, so start a new one
+        _watcher._close()
+        _watcher = None
+        watch_localzone(*_watcher_args)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_parent=_after_fork_in_parent,
+        after_in_child=_after_fork_in_child,
+    )
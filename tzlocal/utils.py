@@ -1,15 +1,42 @@
 import calendar
+import collections
 import datetime
+import io
 import logging
+import math
 import os
+import stat
+import threading
 import time
 import warnings
+import weakref
 import zoneinfo
 
-from tzlocal import windows_tz
-
 log = logging.getLogger("tzlocal")
 
+# Timezones created from files, keyed on a hash of the file contents and the key,
+# with the most recently used last.
+_interned = collections.OrderedDict()
+_interned_lock = threading.Lock()
+_interned_size = 32
+# The file contents of the timezones created from files, for tzlocal.tzif
+_tz_data = weakref.WeakKeyDictionary()
+
+# How timezones are created from files
+ZONE_LOADERS = ("zoneinfo", "mmap")
+_zone_loader = "zoneinfo"
+
+# How often the local zone is checked against the system offset
+VERIFICATION_POLICIES = ("always", "once", "never", "interval")
+_verification_policy = "interval"
+_verification_interval = 60.0
+# The last verified timezone, and until when the verification is valid
+_verified = None
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# How often _probe() checks for transitions
+_PROBE_STEP = 7 * 86400
+
 
 def get_tz_offset(tz):
     """Get timezone's offset using built-in function datetime.utcoffset()."""
@@ -39,6 +66,151 @@ def assert_tz_offset(tz, error=True):
         warnings.warn(msg)
 
 
+def set_verification_policy(policy="interval", interval=60.0):
+    """Sets how often tzlocal checks that the local zone matches the system offset.
+
+    "always" checks every time the local zone is looked up, and on Windows,
+    every time get_localzone() is called. "once" checks each zone once,
+    "never" doesn't check at all, and "interval", which is the default,
+    checks again after the next transition of the zone, or after interval
+    seconds, whichever comes first."""
+    global _verification_policy, _verification_interval, _verified
+    if policy not in VERIFICATION_POLICIES:
+        raise ValueError(f"policy must be one of {', '.join(VERIFICATION_POLICIES)}, not {policy!r}")
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or not 0 < interval < math.inf:
+        raise ValueError(f"interval must be a positive number of seconds, not {interval!r}")
+    _verification_policy = policy
+    _verification_interval = interval
+    _verified = None
+
+
+def set_zone_loader(loader="zoneinfo"):
+    """Sets how timezones are created from files like /etc/localtime.
+
+    "zoneinfo", the default, creates ZoneInfo objects. "mmap" creates
+    tzlocal.mapped.MappedZone objects instead, which memory map the file and
+    read the transitions from it as they are needed. They give the same
+    offsets, but load faster and the data is shared between processes."""
+    global _zone_loader
+    if loader not in ZONE_LOADERS:
+        raise ValueError(f"loader must be one of {', '.join(ZONE_LOADERS)}, not {loader!r}")
+    _zone_loader = loader
+    with _interned_lock:
+        _interned.clear()
+
+
+def _utcoffset(tz, timestamp):
+    """The UTC offset of tz, in seconds, at a UTC time in seconds since the epoch."""
+    offset = (_EPOCH + datetime.timedelta(seconds=timestamp)).astimezone(tz).utcoffset()
+    return 0 if offset is None else int(offset.total_seconds())
+
+
+def _probe(tz, start, end):
+    """Finds the UTC offset changes of tz between start and end by asking it for offsets."""
+    transitions = []
+    offset = _utcoffset(tz, start)
+    while start < end:
+        step = min(start + _PROBE_STEP, end)
+        if _utcoffset(tz, step) != offset:
+            # Find the first second with the new offset
+            low, high = start, step
+            while high - low > 1:
+                middle = (low + high) // 2
+                if _utcoffset(tz, middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            offset = _utcoffset(tz, high)
+            transitions.append(high)
+            step = high
+        start = step
+    return transitions
+
+
+def _verified_until(tz):
+    if _verification_policy == "once":
+        return float("inf")
+    now = int(time.time())
+    until = now + _verification_interval
+    # The offsets are the same until the next transition, if the system
+    # timezone is the same zone, which is what was just checked.
+    changes = _probe(tz, now, math.ceil(until))
+    return changes[0] if changes else until
+
+
+def _check_tz_offset(tz):
+    """Calls assert_tz_offset(tz, error=False) as often as the verification policy says.
+
+    Returns True if it was checked."""
+    global _verified
+    policy = _verification_policy
+    if policy == "never":
+        return False
+    verified = _verified
+    if policy != "always" and verified is not None and verified[0] is tz and time.time() < verified[1]:
+        return False
+    assert_tz_offset(tz, error=False)
+    if policy != "always":
+        _verified = (tz, _verified_until(tz))
+    return True
+
+
+def _file_fingerprint(path):
+    """Returns a cheap fingerprint of a file, or None if it doesn't exist.
+
+    The fingerprint changes when the file is replaced, modified or, for
+    symlinks, pointed somewhere else."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    target = None
+    if stat.S_ISLNK(st.st_mode):
+        try:
+            target = os.readlink(path)
+        except OSError:
+            pass
+    return (st.st_ino, st.st_mtime_ns, st.st_size, target)
+
+
+def _tz_from_file(path, key):
+    """Creates a timezone from a TZif file.
+
+    ZoneInfo.from_file() doesn't cache anything, so this keeps the most
+    recently used timezones, and files with the same contents share one
+    timezone object instead of being parsed again."""
+    import hashlib
+
+    loader = _zone_loader
+    if loader == "mmap":
+        from tzlocal import mapped
+
+        data = mapped._map(path)
+    else:
+        with open(path, "rb") as tzfile:
+            data = tzfile.read()
+    cache_key = (hashlib.blake2b(data, digest_size=16).digest(), key)
+
+    with _interned_lock:
+        tz = _interned.get(cache_key)
+        if tz is not None:
+            _interned.move_to_end(cache_key)
+            return tz
+
+    if loader == "mmap":
+        tz = mapped.MappedZone(data, key, path)
+    else:
+        tz = zoneinfo.ZoneInfo.from_file(io.BytesIO(data), key=key)
+    with _interned_lock:
+        # Another thread may have created it in the meantime
+        tz = _interned.setdefault(cache_key, tz)
+        _tz_data.setdefault(tz, data)
+        _interned.move_to_end(cache_key)
+        while len(_interned) > _interned_size:
+            _interned.popitem(last=False)
+    return tz
+
+
 def _tz_name_from_env(tzenv=None):
     if tzenv is None:
         tzenv = os.environ.get("TZ")
@@ -46,12 +218,14 @@ def _tz_name_from_env(tzenv=None):
     if not tzenv:
         return None
 
-    log.debug(f"Found a TZ environment: {tzenv}")
+    log.debug("Found a TZ environment: %s", tzenv)
 
     if tzenv[0] == ":":
         tzenv = tzenv[1:]
 
-    if tzenv in windows_tz.tz_win:
+    from tzlocal import zoneindex
+
+    if zoneindex.is_zone_key(tzenv):
         # Yup, it's a timezone
         return tzenv
 
@@ -61,17 +235,39 @@ def _tz_name_from_env(tzenv=None):
 
         # Is it a zone info zone?
         possible_tz = "/".join(parts[-2:])
-        if possible_tz in windows_tz.tz_win:
+        if zoneindex.is_zone_key(possible_tz):
             # Yup, it is
             return possible_tz
 
         # Maybe it's a short one, like UTC?
-        if parts[-1] in windows_tz.tz_win:
+        if zoneindex.is_zone_key(parts[-1]):
             # Indeed
             return parts[-1]
 
-    log.debug("TZ does not contain a time zone name")
-    return None
+    # A POSIX TZ string, like "EST5EDT,M3.2.0,M11.1.0", is its own name
+    from tzlocal import posix
+
+    try:
+        posix.parse(tzenv)
+    except ValueError:
+        log.debug("TZ does not contain a time zone name")
+        return None
+    return tzenv
+
+
+def _tz_from_name(name):
+    """Creates the timezone of a name from get_localzone_name().
+
+    That is a zoneinfo name, or a POSIX TZ string from the TZ environment variable."""
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except zoneinfo.ZoneInfoNotFoundError as e:
+        from tzlocal import posix
+
+        try:
+            return posix.parse(name)
+        except ValueError:
+            raise e from None
 
 
 def _tz_from_env(tzenv=None):
@@ -92,17 +288,33 @@ def _tz_from_env(tzenv=None):
         if not tzname:
             # Nope, not a standard timezone name, just take the filename
             tzname = tzenv.split(os.sep)[-1]
-        with open(tzenv, "rb") as tzfile:
-            return zoneinfo.ZoneInfo.from_file(tzfile, key=tzname)
+        return _tz_from_file(tzenv, key=tzname)
 
-    # TZ must specify a zoneinfo zone.
+    # TZ should specify a zoneinfo zone.
     try:
         tz = zoneinfo.ZoneInfo(tzenv)
         # That worked, so we return this:
         return tz
     except zoneinfo.ZoneInfoNotFoundError:
-        # Nope, it's something like "PST4DST" etc, we can't handle that.
+        pass
+
+    # Or it's a POSIX TZ string, like "EST5EDT,M3.2.0,M11.1.0"
+    from tzlocal import posix
+
+    try:
+        return posix.parse(tzenv)
+    except ValueError:
         raise zoneinfo.ZoneInfoNotFoundError(
-            f"tzlocal() does not support non-zoneinfo timezones like {tzenv}. \n"
-            "Please use a timezone in the form of Continent/City"
+            f"tzlocal() does not support the timezone {tzenv}. \n"
+            "Please use a timezone in the form of Continent/City, or a POSIX TZ string"
         ) from None
+
+
+def _after_fork_in_child():
+    global _interned_lock
+    # Any other thread that held the lock doesn't exist in the child
+    _interned_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
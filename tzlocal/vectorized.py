@@ -0,0 +1,108 @@
+"""Converting whole NumPy arrays of times between UTC and local time.
+
+Converting many times one by one with datetime.astimezone() is slow. These
+functions look up the transitions of the timezone once, and then convert
+whole arrays with numpy.searchsorted().
+
+The times can be numpy.datetime64 arrays of any unit, or integer arrays of
+seconds since the epoch. The results have the same type. The timezone
+defaults to get_localzone().
+
+This needs NumPy, which you can install with the "numpy" extra:
+
+    pip install tzlocal[numpy]
+"""
+
+import datetime
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("tzlocal.vectorized needs NumPy, install it with: pip install tzlocal[numpy]") from e
+
+from tzlocal import transitions
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_DAY = 86400
+_MAX_SECONDS = transitions._year_start(transitions.MAX_YEAR)
+
+
+def _table(tz, until):
+    """Returns the transitions of tz, and the offsets before and after each one.
+
+    The table covers at least all times until the time "until"."""
+    year = (_EPOCH + datetime.timedelta(seconds=min(until, _MAX_SECONDS))).year
+    table = transitions.transition_table(tz, end_year=max(year, transitions.DEFAULT_END_YEAR))
+    return np.asarray(table.transitions), np.asarray(table.utcoffsets, dtype=np.int64)
+
+
+def _seconds(times):
+    """Returns the times as int64 seconds since the epoch, and a mask of the NaT values."""
+    times = np.asarray(times)
+    if times.dtype.kind == "M":
+        return times.astype("datetime64[s]").astype(np.int64), np.isnat(times)
+    if times.dtype.kind in "iu":
+        return times.astype(np.int64), np.zeros(times.shape, dtype=bool)
+    raise TypeError(f"Expected datetime64 or integer times, not {times.dtype}")
+
+
+def _until(seconds, nat):
+    valid = seconds[~nat]
+    return int(valid.max()) + _DAY if valid.size else 0
+
+
+def _shift(times, offsets):
+    times = np.asarray(times)
+    if times.dtype.kind == "M":
+        return times + offsets.astype("timedelta64[s]")
+    return times.astype(np.int64) + offsets
+
+
+def _default(tz):
+    if tz is None:
+        from tzlocal import get_localzone
+
+        tz = get_localzone()
+    return tz
+
+
+def utc_offsets(times, tz=None):
+    """Returns the UTC offsets of tz at the UTC times, in seconds, as an int64 array."""
+    tz = _default(tz)
+    seconds, nat = _seconds(times)
+    changes, offsets = _table(tz, _until(seconds, nat))
+    result = offsets[np.searchsorted(changes, seconds, side="right")]
+    result[nat] = 0
+    return result
+
+
+def utc_to_local(times, tz=None):
+    """Converts UTC times to local wall times in tz."""
+    return _shift(times, utc_offsets(times, tz))
+
+
+def local_to_utc(times, tz=None, fold=0, strict=False):
+    """Converts local wall times in tz to UTC times.
+
+    Wall times that happen twice, when the clocks are turned back, and wall
+    times that don't exist, when the clocks are turned forward, are handled
+    like datetime does with the fold attribute: fold=0 uses the offset from
+    before the transition and fold=1 the offset after it. With strict=True,
+    those times raise a ValueError instead."""
+    if fold not in (0, 1):
+        raise ValueError(f"fold must be 0 or 1, not {fold!r}")
+    tz = _default(tz)
+    seconds, nat = _seconds(times)
+    changes, offsets = _table(tz, _until(seconds, nat))
+
+    # The wall times where each transition happens, with the offsets before and after it
+    after = np.searchsorted(changes + offsets[1:], seconds, side="right")
+    before = np.searchsorted(changes + offsets[:-1], seconds, side="right")
+    if strict:
+        unclear = (after != before) & ~nat
+        if unclear.any():
+            raise ValueError(f"{np.asarray(times)[unclear][0]} is ambiguous or doesn't exist in {tz}")
+
+    result = offsets[np.maximum(after, before) if fold else np.minimum(after, before)]
+    result[nat] = 0
+    return _shift(times, -result)
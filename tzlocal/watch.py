@@ -0,0 +1,233 @@
+"""Watches time zone configuration files and tells you when they change.
+
+On Linux this uses inotify through ctypes, everywhere else (or if inotify
+isn't available) it falls back to polling the files with stat().
+"""
+
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+
+from tzlocal import utils
+
+log = logging.getLogger("tzlocal")
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+# The watched directory is gone, or events were lost, so everything has to be watched again
+_REWATCH_MASK = IN_DELETE_SELF | IN_MOVE_SELF | IN_Q_OVERFLOW | IN_IGNORED
+_event_header = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """Returns libc if it has inotify, otherwise None."""
+    try:
+        # The symbols of the running process include libc
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not (hasattr(libc, "inotify_init1") and hasattr(libc, "inotify_add_watch")):
+            return None
+    except (OSError, TypeError):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class _Watcher:
+    """Base class for watchers, runs _run() in a daemon thread."""
+
+    def __init__(self, paths, callback):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"tzlocal-{type(self).__name__}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _close(self):
+        """Releases the resources of the watcher, without stopping the thread.
+
+        Used in a forked child process, where the thread doesn't exist."""
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _changed(self):
+        try:
+            self.callback()
+        except Exception:
+            log.exception("tzlocal watcher callback failed")
+
+
+class PollingWatcher(_Watcher):
+    """Checks the files with stat() every poll_interval seconds."""
+
+    def __init__(self, paths, callback, poll_interval=5.0):
+        super().__init__(paths, callback)
+        self.poll_interval = poll_interval
+        self._fingerprints = self._fingerprint()
+
+    def _fingerprint(self):
+        return [utils._file_fingerprint(path) for path in self.paths]
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            fingerprints = self._fingerprint()
+            if fingerprints != self._fingerprints:
+                log.debug("Time zone configuration changed")
+                self._fingerprints = fingerprints
+                self._changed()
+
+
+class InotifyWatcher(_Watcher):
+    """Gets told about changes by the Linux kernel.
+
+    The containing directories are watched rather than the files, so that
+    files that are replaced, created or deleted (which is what package
+    managers and timedatectl do) are noticed as well. If a directory doesn't
+    exist, the closest parent directory that does is watched, until it is
+    created. Files that can't be watched at all are polled every
+    poll_interval seconds instead."""
+
+    def __init__(self, paths, callback, libc=None, poll_interval=5.0):
+        super().__init__(paths, callback)
+        self._libc = libc or _load_inotify()
+        if self._libc is None:
+            raise OSError("inotify is not available")
+        self.poll_interval = poll_interval
+
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._add_watches()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+    def _add_watches(self):
+        # Map of watch descriptor to the names in that directory we care about,
+        # and if the name is a missing directory on the way to a watched file.
+        self._names = {}
+        # The paths that can't be watched, and are polled
+        self._polled = []
+        for path in self.paths:
+            directory, name = os.path.split(path)
+            while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+                directory, name = os.path.split(directory)
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                log.debug("Can not watch %s, polling %s instead", directory, path)
+                self._polled.append(path)
+                continue
+            names = self._names.setdefault(wd, {})
+            name = os.fsencode(name)
+            names[name] = names.get(name, False) or directory != os.path.dirname(path)
+        self._fingerprints = [utils._file_fingerprint(path) for path in self._polled]
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            os.write(self._wakeup_w, b"x")
+        super().stop()
+        self._close()
+
+    def _close(self):
+        super()._close()
+        for fd in (self._fd, self._wakeup_r, self._wakeup_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _read_events(self, data):
+        """Returns if the events in data are changes, and if the watches have to be added again."""
+        changed = rewatch = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW or (wd in self._names and mask & _REWATCH_MASK):
+                changed = rewatch = True
+                continue
+            missing_directory = self._names.get(wd, {}).get(name)
+            if missing_directory is not None:
+                changed = True
+                # A directory on the way to a watched file was created
+                rewatch = rewatch or missing_directory
+        return changed, rewatch
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = self.poll_interval if self._polled else None
+            readable, _, _ = select.select([self._fd, self._wakeup_r], [], [], timeout)
+            changed = rewatch = False
+            if self._fd in readable:
+                try:
+                    changed, rewatch = self._read_events(os.read(self._fd, 65536))
+                except BlockingIOError:
+                    pass
+            if self._polled:
+                fingerprints = [utils._file_fingerprint(path) for path in self._polled]
+                changed = changed or fingerprints != self._fingerprints
+                self._fingerprints = fingerprints
+            if rewatch and not self._stop.is_set():
+                log.debug("Watching the time zone configuration again")
+                self._add_watches()
+
+            if changed:
+                log.debug("Time zone configuration changed")
+                self._changed()
+
+
+def watch(paths, callback, poll_interval=5.0, use_inotify=True):
+    """Starts a watcher that calls callback() when any of the paths change.
+
+    Uses inotify if possible, otherwise polls every poll_interval seconds.
+    Returns the started watcher, call stop() on it to stop watching."""
+    watcher = None
+    if use_inotify:
+        try:
+            watcher = InotifyWatcher(paths, callback, poll_interval=poll_interval)
+        except OSError as e:
+            log.debug("Not using inotify: %s", e)
+    if watcher is None:
+        watcher = PollingWatcher(paths, callback, poll_interval=poll_interval)
+    watcher.start()
+    return watcher
@@ -1,5 +1,6 @@
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, tzinfo
 
 try:
     import _winreg as winreg
@@ -8,11 +9,12 @@ except ImportError:
 
 import zoneinfo
 
-from tzlocal import utils
-from tzlocal.windows_tz import win_tz
+from tzlocal import translate, utils
 
 _cache_tz = None
 _cache_tz_name = None
+# Held while the cache is filled or changed, so only one thread looks up the zone
+_cache_lock = threading.RLock()
 
 log = logging.getLogger("tzlocal")
 
@@ -71,11 +73,8 @@ def _get_localzone_name():
         # Don't support XP any longer
         raise LookupError("Can not find Windows timezone configuration")
 
-    timezone = win_tz.get(tzkeyname)
-    if timezone is None:
-        # Nope, that didn't work. Try adding "Standard Time",
-        # it seems to work a lot of times:
-        timezone = win_tz.get(tzkeyname + " Standard Time")
+    # This also finds names without "Standard Time" at the end, or in other cases
+    timezone = translate.win_to_tz_name(tzkeyname)
 
     # Return what we have.
     if timezone is None:
@@ -108,33 +107,51 @@ def _get_localzone_name():
 def get_localzone_name() -> str:
     """Get the zoneinfo timezone name that matches the Windows-configured timezone."""
     global _cache_tz_name
-    if _cache_tz_name is None:
-        _cache_tz_name = _get_localzone_name()
+    tzname = _cache_tz_name
+    if tzname is None:
+        with _cache_lock:
+            # Another thread may have looked it up while we waited for the lock
+            if _cache_tz_name is None:
+                _cache_tz_name = _get_localzone_name()
+            tzname = _cache_tz_name
 
-    return _cache_tz_name
+    return tzname
 
 
-def get_localzone() -> zoneinfo.ZoneInfo:
+def get_localzone() -> tzinfo:
     """Returns the zoneinfo-based tzinfo object that matches the Windows-configured timezone."""
 
     global _cache_tz
-    if _cache_tz is None:
-        _cache_tz = zoneinfo.ZoneInfo(get_localzone_name())
+    tz = _cache_tz
+    if tz is None:
+        with _cache_lock:
+            # Another thread may have looked it up while we waited for the lock
+            if _cache_tz is None:
+                _cache_tz = utils._tz_from_name(get_localzone_name())
+            tz = _cache_tz
 
     if not utils._tz_name_from_env():
         # If the timezone does NOT come from a TZ environment variable,
         # verify that it's correct. If it's from the environment,
         # we accept it, this is so you can run tests with different timezones.
-        utils.assert_tz_offset(_cache_tz, error=False)
+        utils._check_tz_offset(tz)
 
-    return _cache_tz
+    return tz
 
 
-def reload_localzone() -> zoneinfo.ZoneInfo:
+def reload_localzone() -> tzinfo:
     """Reload the cached localzone. You need to call this if the timezone has changed."""
     global _cache_tz
     global _cache_tz_name
-    _cache_tz_name = _get_localzone_name()
-    _cache_tz = zoneinfo.ZoneInfo(_cache_tz_name)
-    utils.assert_tz_offset(_cache_tz, error=False)
-    return _cache_tz
+    from tzlocal import zoneindex
+
+    with _cache_lock:
+        # The zoneinfo tree may have changed too
+        zoneindex.clear_cache()
+        # Look up both before changing the cache, so the name and zone are
+        # replaced together, and nothing changes if the lookup fails.
+        tzname = _get_localzone_name()
+        tz = utils._tz_from_name(tzname)
+        _cache_tz_name, _cache_tz = tzname, tz
+    utils._check_tz_offset(tz)
+    return tz
@@ -0,0 +1,210 @@
+"""A compact index of the Windows to zoneinfo timezone mappings.
+
+This holds the same data as tzlocal.windows_tz, but in the binary file
+windows_tz.idx generated by update_windows_mappings.py, which is memory
+mapped instead of being turned into Python dictionaries. Each name is stored
+only once, in a sorted string table, so it can be searched with a binary
+search.
+
+The file format is, with all numbers little endian:
+
+    header:       magic b"TZWI", version (uint16), string count n (uint16),
+                  string table size (uint32)
+    offsets:      n + 1 uint32 offsets of the strings in the string table
+    zone targets: n uint16 string numbers, the Windows zone of each zoneinfo
+                  name, or 0xFFFF if the string isn't a zoneinfo name
+    win targets:  n uint16 string numbers, the zoneinfo zone of each Windows
+                  name, or 0xFFFF if the string isn't a Windows name
+    folded order: n uint16 string numbers, sorted case-insensitively
+    strings:      the ASCII strings, sorted, without separators
+"""
+
+import bisect
+import functools
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"TZWI"
+VERSION = 1
+NO_TARGET = 0xFFFF
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "windows_tz.idx")
+
+_header = struct.Struct("<4sHHI")
+
+
+def build_index(win_tz, tz_win):
+    """Builds the binary index from the win_tz and tz_win mappings."""
+    strings = sorted(set(win_tz) | set(win_tz.values()) | set(tz_win) | set(tz_win.values()))
+    if len(strings) >= NO_TARGET:
+        raise ValueError("Too many names for the index format")
+    numbers = {name: number for number, name in enumerate(strings)}
+
+    encoded = [name.encode("ascii") for name in strings]
+    offsets = array("I", [0])
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+
+    zone_targets = array("H", [NO_TARGET] * len(strings))
+    for zone, win in tz_win.items():
+        zone_targets[numbers[zone]] = numbers[win]
+    win_targets = array("H", [NO_TARGET] * len(strings))
+    for win, zone in win_tz.items():
+        win_targets[numbers[win]] = numbers[zone]
+    folded_order = array("H", sorted(range(len(strings)), key=lambda number: strings[number].lower()))
+
+    parts = [offsets, zone_targets, win_targets, folded_order]
+    if sys.byteorder != "little":
+        for part in parts:
+            part.byteswap()
+    blob = b"".join(encoded)
+    return _header.pack(MAGIC, VERSION, len(strings), len(blob)) + b"".join(part.tobytes() for part in parts) + blob
+
+
+class _Strings:
+    """A read-only sequence of the strings in the index, for bisect."""
+
+    def __init__(self, index, order=None, fold=False):
+        self._index = index
+        self._order = order
+        self._fold = fold
+
+    def __len__(self):
+        return self._index._count
+
+    def __getitem__(self, position):
+        if self._order is not None:
+            position = self._order[position]
+        name = self._index._string(position)
+        return name.lower() if self._fold else name
+
+
+class WindowsZoneIndex:
+    """Looks up names in the binary index.
+
+    All lookups can be made case-insensitive with ignore_case=True."""
+
+    def __init__(self, data):
+        self._data = data
+        view = memoryview(data)
+        magic, version, count, size = _header.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a tzlocal Windows zone index")
+        self._count = count
+
+        start = _header.size
+        self._offsets = self._array(view, "I", start, count + 1)
+        start += (count + 1) * 4
+        self._zone_targets = self._array(view, "H", start, count)
+        start += count * 2
+        self._win_targets = self._array(view, "H", start, count)
+        start += count * 2
+        self._folded_order = self._array(view, "H", start, count)
+        start += count * 2
+        self._strings = view[start : start + size]
+
+        self._sorted = _Strings(self)
+        self._folded = _Strings(self, self._folded_order, fold=True)
+
+    @staticmethod
+    def _array(view, typecode, start, count):
+        size = array(typecode).itemsize
+        part = view[start : start + count * size]
+        if sys.byteorder == "little":
+            # No copying needed, we can use the data directly
+            return part.cast(typecode)
+        result = array(typecode, part.tobytes())
+        result.byteswap()
+        return result
+
+    def _string(self, number):
+        return str(self._strings[self._offsets[number] : self._offsets[number + 1]], "ascii")
+
+    def _find(self, name, ignore_case=False):
+        """Returns the string number of name, or None"""
+        if ignore_case:
+            name = name.lower()
+            position = bisect.bisect_left(self._folded, name)
+            if position < self._count and self._folded[position] == name:
+                return self._folded_order[position]
+            return None
+
+        position = bisect.bisect_left(self._sorted, name)
+        if position < self._count and self._sorted[position] == name:
+            return position
+        return None
+
+    def _target(self, targets, name, ignore_case):
+        number = self._find(name, ignore_case)
+        if number is None or targets[number] == NO_TARGET:
+            return None
+        return self._string(targets[number])
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, name):
+        return self.is_zone_name(name)
+
+    def find(self, name, ignore_case=False):
+        """Returns the name as it's spelled in the index, or None if it isn't there."""
+        number = self._find(name, ignore_case)
+        return None if number is None else self._string(number)
+
+    def is_zone_name(self, name, ignore_case=False):
+        """Is this a zoneinfo name that has a Windows mapping?"""
+        return self.tz_to_win(name, ignore_case) is not None
+
+    def is_windows_name(self, name, ignore_case=False):
+        """Is this a Windows timezone name?"""
+        return self.win_to_tz(name, ignore_case) is not None
+
+    def tz_to_win(self, name, ignore_case=False):
+        """Returns the Windows name of a zoneinfo zone, or None."""
+        return self._target(self._zone_targets, name, ignore_case)
+
+    def win_to_tz(self, name, ignore_case=False):
+        """Returns the zoneinfo zone of a Windows timezone name, or None."""
+        return self._target(self._win_targets, name, ignore_case)
+
+    def startswith(self, prefix, ignore_case=False):
+        """Returns all names in the index that start with prefix, in sorted order."""
+        if ignore_case:
+            prefix = prefix.lower()
+            strings, order = self._folded, self._folded_order
+        else:
+            strings, order = self._sorted, range(self._count)
+
+        result = []
+        position = bisect.bisect_left(strings, prefix)
+        while position < self._count and strings[position].startswith(prefix):
+            result.append(self._string(order[position]))
+            position += 1
+        return result
+
+    def zone_names(self):
+        """All zoneinfo names that have a Windows mapping."""
+        return [self._string(number) for number in range(self._count) if self._zone_targets[number] != NO_TARGET]
+
+    def windows_names(self):
+        """All Windows timezone names."""
+        return [self._string(number) for number in range(self._count) if self._win_targets[number] != NO_TARGET]
+
+
+def load_index(path=INDEX_FILE):
+    """Memory maps an index file and returns a WindowsZoneIndex for it."""
+    with open(path, "rb") as indexfile:
+        try:
+            data = mmap.mmap(indexfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Some file systems can't be memory mapped
+            data = indexfile.read()
+    return WindowsZoneIndex(data)
+
+
+@functools.cache
+def get_index():
+    """Returns the index of the Windows mappings that ships with tzlocal."""
+    return load_index()
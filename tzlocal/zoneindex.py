@@ -0,0 +1,262 @@
+"""An index of the timezone names in the zoneinfo tree.
+
+Checking if a name is a timezone by creating a ZoneInfo for it means reading
+and parsing the file, and an exception for every name that isn't one. This
+keeps the listings of the zoneinfo directories instead, so that checking a
+name is a few dictionary lookups. Directories are listed the first time a
+name in them is checked, so checking one name doesn't list the whole tree.
+
+get_index() returns a ZoneIndex of the whole tree, with all the names, and
+which names are aliases of each other. It is built once, and built again if
+zoneinfo.TZPATH or the zoneinfo directories change.
+"""
+
+import functools
+import os
+import threading
+import zoneinfo
+
+# Files in the zoneinfo tree that are not timezones
+_not_zone_names = {"localtime", "posixrules", "leapseconds", "SECURITY", "+VERSION", "Makefile"}
+# Copies of the tree with other leap second handling, which zoneinfo.available_timezones() skips
+_skipped_directories = {"posix", "right"}
+
+# The directories listed so far: path -> {name: is a directory}
+_listings = {}
+_listings_lock = threading.Lock()
+
+# The ZoneIndex of the whole tree, and the signature of the tree it was built from
+_index = None
+_index_signature = None
+_index_lock = threading.Lock()
+
+
+def _listing(directory):
+    listing = _listings.get(directory)
+    if listing is None:
+        listing = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        listing[entry.name] = entry.is_dir()
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            # There is nothing in it, and the index is rebuilt if TZPATH changes
+            pass
+        except OSError:
+            # Maybe too many open files, so try again the next time
+            return {}
+        with _listings_lock:
+            listing = _listings.setdefault(directory, listing)
+    return listing
+
+
+@functools.cache
+def _tzdata_keys():
+    """The timezones in the tzdata package, which zoneinfo also uses, if it's installed."""
+    try:
+        import importlib.resources
+
+        zones = importlib.resources.files("tzdata").joinpath("zones").read_text(encoding="ascii")
+    except (ImportError, OSError, ValueError):
+        return frozenset()
+    return frozenset(zones.split())
+
+
+def _in_tzpath(name):
+    parts = name.split("/")
+    if parts[0] in _skipped_directories or parts[-1] in _not_zone_names or "." in parts[-1]:
+        return False
+    if any(part in ("", ".", "..") for part in parts):
+        return False
+
+    for tzpath in zoneinfo.TZPATH:
+        directory = tzpath
+        for part in parts[:-1]:
+            if _listing(directory).get(part) is not True:
+                break
+            directory = os.path.join(directory, part)
+        else:
+            if _listing(directory).get(parts[-1]) is False:
+                return True
+    return False
+
+
+def is_zone_key(name):
+    """Checks if name is the name of a timezone in zoneinfo.TZPATH or the tzdata package.
+
+    This looks at the names of the files, not at what's in them. Names that
+    are in neither, but are in the Windows mappings, are timezones too."""
+    if _in_tzpath(name) or name in _tzdata_keys():
+        return True
+    if name.rsplit("/", 1)[-1] in _not_zone_names:
+        return False
+
+    from tzlocal import windows_index
+
+    return windows_index.get_index().is_zone_name(name)
+
+
+def zone_name_from_path(path):
+    """Finds the timezone name at the end of the path of a zoneinfo file.
+
+    This looks for the longest end of the path that is a timezone name, so
+    /usr/share/zoneinfo/Europe/Paris gives Europe/Paris. Returns None if no
+    end of the path is a timezone name."""
+    parts = path.replace(os.sep, "/").split("/")
+    names = ["/".join(parts[start:]) for start in range(len(parts))]
+    # Look in the zoneinfo tree first, the tzdata package is slower to load
+    for name in names:
+        if name and _in_tzpath(name):
+            return name
+    for name in names:
+        if name in _tzdata_keys():
+            return name
+    return None
+
+
+class ZoneIndex:
+    """All the timezone names in the zoneinfo tree, and which are aliases of each other.
+
+    Names are aliases if they are symlinks to the same file, or hard links of
+    the same file. The canonical name of a group of aliases is the file the
+    symlinks point to, or for hard links, the first name in sorted order."""
+
+    def __init__(self, names, canonical):
+        #: All the timezone names
+        self.names = frozenset(names)
+        self._canonical = canonical
+        groups = {}
+        for name in sorted(self.names):
+            groups.setdefault(self.canonical_name(name), []).append(name)
+        self._aliases = {canonical_name: tuple(group) for canonical_name, group in groups.items()}
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def canonical_name(self, name):
+        """The canonical name of name, or name itself if it isn't an alias."""
+        return self._canonical.get(name, name)
+
+    def aliases(self, name):
+        """All names that are aliases of name, including name itself, sorted."""
+        return self._aliases.get(self.canonical_name(name), (name,))
+
+    def utc_name(self):
+        """The name to use for UTC, or None if there is no UTC zone."""
+        for name in ("UTC", "Etc/UTC"):
+            if name in self.names:
+                return name
+        return next((name for name in sorted(self.names) if "UTC" in name), None)
+
+
+def _scan_tree(tzpath, names, canonical):
+    """Adds the names in one zoneinfo directory, and the canonical names of its aliases."""
+    inodes = {}
+    symlinks = {}
+    pending = [(tzpath, "")]
+    while pending:
+        directory, prefix = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            name = prefix + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if prefix or entry.name not in _skipped_directories:
+                        pending.append((entry.path, name + "/"))
+                elif "." not in entry.name and entry.name not in _not_zone_names:
+                    if entry.is_symlink():
+                        symlinks[name] = entry.path
+                    elif entry.is_file(follow_symlinks=False):
+                        inodes.setdefault(entry.inode(), []).append(name)
+                    else:
+                        continue
+                    names.add(name)
+            except OSError:
+                continue
+
+    # Hard links of the same file
+    for group in inodes.values():
+        group.sort()
+        for name in group[1:]:
+            canonical.setdefault(name, group[0])
+
+    # Symlinks point to their target, if it's in the same tree
+    root = os.path.join(tzpath, "")
+    for name, path in symlinks.items():
+        for _ in range(40):
+            try:
+                path = os.path.normpath(os.path.join(os.path.dirname(path), os.readlink(path)))
+            except OSError:
+                break
+        if path.startswith(root):
+            target = path[len(root) :].replace(os.sep, "/")
+            if target in names:
+                canonical.setdefault(name, canonical.get(target, target))
+
+
+def _signature():
+    """Changes when zoneinfo.TZPATH or the zoneinfo directories change."""
+    signature = [zoneinfo.TZPATH]
+    for tzpath in zoneinfo.TZPATH:
+        for path in (tzpath, os.path.join(tzpath, "tzdata.zi")):
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+    return tuple(signature)
+
+
+def clear_cache():
+    """Forgets the directory listings and the index, so the zoneinfo tree is read again."""
+    global _index, _index_signature
+    with _index_lock:
+        _index = None
+        _index_signature = None
+        with _listings_lock:
+            _listings.clear()
+
+
+def get_index():
+    """Returns the ZoneIndex of zoneinfo.TZPATH and the tzdata package.
+
+    The index is built the first time, and again when zoneinfo.TZPATH, or
+    the modification time of the zoneinfo directories, has changed."""
+    global _index, _index_signature
+    signature = _signature()
+    with _index_lock:
+        if _index is not None and signature == _index_signature:
+            return _index
+
+        names = set()
+        canonical = {}
+        for tzpath in zoneinfo.TZPATH:
+            _scan_tree(tzpath, names, canonical)
+        names.update(_tzdata_keys())
+        _index = ZoneIndex(names, canonical)
+        if _index_signature is not None:
+            # The tree changed, so the directory listings may be out of date too
+            with _listings_lock:
+                _listings.clear()
+        _index_signature = signature
+        return _index
+
+
+def _after_fork_in_child():
+    global _index_lock
+    global _listings_lock
+    # Any other thread that held the locks doesn't exist in the child
+    _index_lock = threading.Lock()
+    _listings_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -3,49 +3,70 @@
 # This script generates the mapping between MS Windows timezone names and
 # tzdata/Olsen timezone names, by retrieving a file:
 # http://unicode.org/cldr/data/common/supplemental/supplementalData.xml
-# and parsing it, and from this generating the file windows_tz.py.
+# and parsing it, and from this generating the file windows_tz.py, and the
+# compact binary index of the same data, windows_tz.idx.
+#
+# It also generates tz_aliases.py, the canonical names of the old timezone
+# names, from the "backward" file of the tzdata database.
+#
+# The inputs can also be local files, so it can run without network access:
+#
+#     python update_windows_mappings.py --tzdata tzdata-latest.tar.gz --windows-zones windowsZones.xml
+#
+# The tzdata input can be the tarball, or just its backward file. A hash of
+# the inputs is saved in windows_tz.py, and the files are only generated
+# again if the inputs have changed, unless you use --force. The mappings
+# that were added, removed or changed are printed.
 #
 # It must be run with Python 3.
 
-import ftplib
+import argparse
+import hashlib
+import io
+import json
 import logging
+import os
+import runpy
 import tarfile
-from io import BytesIO
-from pprint import pprint
 from urllib.parse import urlparse
 from urllib.request import urlopen
-from xml.dom import minidom
+from xml.etree import ElementTree
+
+from tzlocal.windows_index import INDEX_FILE, build_index
 
+OUTPUT_DIR = "tzlocal"
 WIN_ZONES_URL = "https://raw.githubusercontent.com/unicode-org/cldr/master/common/supplemental/windowsZones.xml"
 ZONEINFO_URL = "ftp://ftp.iana.org/tz/tzdata-latest.tar.gz"
+HASH_PREFIX = "# Input hash: "
+HEADER = "# This file is autogenerated by the update_windows_mapping.py script\n# Do not edit.\n"
 
-logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("tzlocal")
 
 
-def update_old_names():
-    """Fetches the list of old tz names and returns a mapping"""
+def read_input(source):
+    """Reads a local file, or downloads it if source is a URL"""
+    if urlparse(source).scheme in ("ftp", "http", "https"):
+        log.info(f"Fetching {source}")
+        with urlopen(source) as response:
+            return response.read()
+    log.info(f"Reading {source}")
+    with open(source, "rb") as infile:
+        return infile.read()
+
 
-    url = urlparse(ZONEINFO_URL)
-    log.info(f"Connecting to {url.netloc}")
-    ftp = ftplib.FTP(url.netloc)
-    ftp.login()
-    gzfile = BytesIO()
+def input_hash(*inputs):
+    digest = hashlib.sha256()
+    for data in inputs:
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
 
-    log.info("Fetching zoneinfo database")
-    ftp.retrbinary("RETR " + url.path, gzfile.write)
-    gzfile.seek(0)
 
-    log.info("Extracting backwards data")
-    archive = tarfile.open(mode="r:gz", fileobj=gzfile)
+def parse_backward(data):
+    """Returns a mapping of the old tz names to the names they link to"""
     backward = {}
-    for line in archive.extractfile("backward").readlines():
-        if line[0] == "#":
-            continue
-        if len(line.strip()) == 0:
-            continue
+    for line in data.splitlines():
         parts = line.split()
-        if parts[0] != b"Link":
+        if not parts or parts[0] != b"Link":
             continue
 
         backward[parts[2].decode("ascii")] = parts[1].decode("ascii")
@@ -53,36 +74,46 @@ def update_old_names():
     return backward
 
 
-def update_windows_zones():
-    backward = update_old_names()
+def read_old_names(data):
+    """Returns the mapping of old tz names from a tzdata tarball, or its backward file"""
+    try:
+        # Read the tarball as a stream, and stop when the backward file is found
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r|*") as archive:
+            log.info("Extracting backwards data")
+            for member in archive:
+                if os.path.normpath(member.name) == "backward":
+                    return parse_backward(archive.extractfile(member).read())
+    except tarfile.ReadError:
+        # Not a tarball, so it's the backward file itself
+        return parse_backward(data)
 
-    log.info("Fetching Windows mapping info from unicode.org")
-    source = urlopen(WIN_ZONES_URL).read()
-    dom = minidom.parseString(source)
+    raise ValueError("There is no backward file in the tzdata tarball")
 
-    for element in dom.getElementsByTagName("mapTimezones"):
-        if element.getAttribute("type") == "windows":
-            break
 
-    log.info("Making windows mapping")
+def parse_windows_zones(data):
+    """Returns the win_tz and tz_win mappings from the CLDR windowsZones.xml"""
     win_tz = {}
     tz_win = {}
-    for mapping in element.getElementsByTagName("mapZone"):
-        if mapping.getAttribute("territory") == "001":
-            win_tz[mapping.getAttribute("other")] = mapping.getAttribute("type").split(
-                " "
-            )[0]
-            if win_tz[mapping.getAttribute("other")].startswith("Etc"):
-                print(
-                    win_tz[mapping.getAttribute("other")],
-                    mapping.getAttribute("type").split(" ")[0],
-                )
-
-        for tz_name in mapping.getAttribute("type").split(" "):
-            tz_win[tz_name] = mapping.getAttribute("other")
-
-    log.info("Adding backwards and forwards data")
-    # Map in the backwards (or forwards) compatible zone names
+    in_windows = False
+    for event, element in ElementTree.iterparse(io.BytesIO(data), events=("start", "end")):
+        if element.tag == "mapTimezones":
+            # The Windows mappings have no type, or the type "windows"
+            in_windows = event == "start" and element.get("type", "windows") == "windows"
+        elif event == "end" and element.tag == "mapZone" and in_windows:
+            windows_name = element.get("other")
+            tz_names = element.get("type", "").split()
+            if element.get("territory") == "001" and tz_names:
+                win_tz[windows_name] = tz_names[0]
+            for tz_name in tz_names:
+                tz_win[tz_name] = windows_name
+        if event == "end":
+            # Only the attributes are needed, so don't keep the parsed elements
+            element.clear()
+    return win_tz, tz_win
+
+
+def add_old_names(tz_win, backward):
+    """Map in the backwards (or forwards) compatible zone names"""
     for backward_compat_name, standard_name in backward.items():
         if backward_compat_name not in tz_win:
             win_zone = tz_win.get(standard_name, None)
@@ -96,20 +127,127 @@ def update_windows_zones():
     # Etc/UTC is a common but non-standard alias for Etc/GMT:
     tz_win["Etc/UTC"] = "UTC"
 
+
+def canonical_names(backward):
+    """Resolves the links in backward that point to other links"""
+    aliases = {}
+    for name, target in backward.items():
+        seen = {name}
+        while target in backward and target not in seen:
+            seen.add(target)
+            target = backward[target]
+        aliases[name] = target
+    return aliases
+
+
+def write_dict(out, name, mapping):
+    """Writes the mapping sorted, and formatted the way ruff formats it"""
+    out.write(f"{name} = {{\n")
+    for key, value in sorted(mapping.items()):
+        out.write(f"    {json.dumps(key)}: {json.dumps(value)},\n")
+    out.write("}\n")
+
+
+def write_aliases(path, backward):
+    log.info("Writing aliases")
+    with open(path, "w") as out:
+        out.write(HEADER + "# The canonical names of old and alternative timezone names:\n")
+        write_dict(out, "aliases", canonical_names(backward))
+
+
+def write_mappings(path, win_tz, tz_win, digest):
     log.info("Writing mapping")
-    with open("tzlocal/windows_tz.py", "w") as out:
-        out.write(
-            "# This file is autogenerated by the update_windows_mapping.py script\n"
-            "# Do not edit.\nwin_tz = "
-        )
-        pprint(win_tz, out)
-        out.write(
-            "\n# Old name for the win_tz variable:\ntz_names = win_tz\n\ntz_win = "
-        )
-        pprint(tz_win, out)
+    with open(path, "w") as out:
+        out.write(HEADER + HASH_PREFIX + digest + "\n")
+        write_dict(out, "win_tz", win_tz)
+        out.write("\n# Old name for the win_tz variable:\ntz_names = win_tz\n\n")
+        write_dict(out, "tz_win", tz_win)
+
+
+def read_mappings(path):
+    """Returns the hash of the inputs, and the win_tz and tz_win mappings, of a generated windows_tz.py"""
+    try:
+        with open(path) as infile:
+            lines = [infile.readline() for _ in range(3)]
+    except OSError:
+        return None, {}, {}
+    digest = next((line[len(HASH_PREFIX) :].strip() for line in lines if line.startswith(HASH_PREFIX)), None)
+    mappings = runpy.run_path(path)
+    return digest, mappings.get("win_tz", {}), mappings.get("tz_win", {})
+
+
+def compare(name, old, new):
+    """Returns lines describing the added, removed and changed mappings"""
+    changes = []
+    for key in sorted(old.keys() | new.keys()):
+        if key not in new:
+            changes.append(f"- {name}[{key!r}] = {old[key]!r}")
+        elif key not in old:
+            changes.append(f"+ {name}[{key!r}] = {new[key]!r}")
+        elif old[key] != new[key]:
+            changes.append(f"~ {name}[{key!r}] = {new[key]!r} (was {old[key]!r})")
+    return changes
+
+
+def update_windows_zones(tzdata=ZONEINFO_URL, windows_zones=WIN_ZONES_URL, output_dir=OUTPUT_DIR, force=False):
+    """Generates the mapping files from the inputs, if they have changed.
+
+    Returns the changes in the mappings, or None if the inputs were the same as last time."""
+    mappings_path = os.path.join(output_dir, "windows_tz.py")
+    aliases_path = os.path.join(output_dir, "tz_aliases.py")
+    index_path = os.path.join(output_dir, os.path.basename(INDEX_FILE))
+
+    tzdata_data = read_input(tzdata)
+    windows_zones_data = read_input(windows_zones)
+    digest = input_hash(tzdata_data, windows_zones_data)
+    old_digest, old_win_tz, old_tz_win = read_mappings(mappings_path)
+    outputs_exist = all(os.path.exists(path) for path in (aliases_path, index_path))
+    if digest == old_digest and outputs_exist and not force:
+        log.info("The inputs have not changed")
+        return None
+
+    backward = read_old_names(tzdata_data)
+    write_aliases(aliases_path, backward)
+
+    log.info("Making windows mapping")
+    win_tz, tz_win = parse_windows_zones(windows_zones_data)
+    if not win_tz:
+        raise ValueError("No Windows mappings found in the windowsZones.xml")
+
+    log.info("Adding backwards and forwards data")
+    add_old_names(tz_win, backward)
+
+    write_mappings(mappings_path, win_tz, tz_win, digest)
+
+    log.info("Writing index")
+    with open(index_path, "wb") as out:
+        out.write(build_index(win_tz, tz_win))
 
     log.info("Done")
+    return compare("win_tz", old_win_tz, win_tz) + compare("tz_win", old_tz_win, tz_win)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generates the Windows timezone mappings of tzlocal.")
+    parser.add_argument(
+        "--tzdata", default=ZONEINFO_URL, help="The tzdata tarball, or its backward file, a path or URL"
+    )
+    parser.add_argument("--windows-zones", default=WIN_ZONES_URL, help="The CLDR windowsZones.xml, a path or URL")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where to write the files, default: tzlocal")
+    parser.add_argument("--force", action="store_true", help="Generate the files even if the inputs haven't changed")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    changes = update_windows_zones(options.tzdata, options.windows_zones, options.output_dir, options.force)
+    if changes is None:
+        print("The inputs have not changed, nothing was generated.")
+    elif not changes:
+        print("The mappings have not changed.")
+    else:
+        print(f"{len(changes)} mappings changed:")
+        for change in changes:
+            print(change)
 
 
 if __name__ == "__main__":
-    update_windows_zones()
+    main()